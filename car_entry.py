@@ -1,29 +1,56 @@
+import os
+
+# Plate crops are tiny; Tesseract's OpenMP fan-out only adds overhead
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
 import cv2
 from ultralytics import YOLO
-import pytesseract
-import os
+from tesserocr import PyTessBaseAPI, PSM, OEM
+from PIL import Image
 import time
+import threading
+import queue
 import serial
 import serial.tools.list_ports
 import csv
 from collections import Counter, deque
 import numpy as np
 import random
+import re
+import functools
 from utils.data_handler import save_vehicle_entry, update_vehicle_exit, get_db_connection
+from utils.plates_log import locked_plates_log, is_replaced, PLATES_LOG_JOURNAL
 from sqlalchemy import text
 from datetime import datetime, timedelta
 
+try:
+    from utils.ocr_pre import preprocess as numba_preprocess
+except ImportError:  # numba is optional; OpenCV path is the default
+    numba_preprocess = None
+
 # ===== Configuration =====
 CONFIG = {
     "model_path": "./best.pt",
+    # Exported from model_path on first run. Delete an export made before batching
+    # (static batch 1) so it is re-exported with a dynamic batch
+    "openvino_model_path": "./best_openvino_model/",
+    "openvino_int8_model_path": "./best_int8_openvino_model/",
+    "model_precision": "fp16",  # "int8" for CPU-only gates (post-training quantized)
+    "calibration_data": "./license_plate.yaml",  # val split is used to calibrate INT8
     "save_dir": "plates",
     "csv_file": "./database/plates_log.csv",
     "arduino_baudrate": 9600,
     "ultrasonic_threshold": 50,  # cm
+    "motion_threshold": 3.0,  # mean of the MOG2 foreground mask (0-255) needed to run YOLO
     "plate_buffer_size": 3,
+    "detect_size": (640, 384),  # (w, h) frames are downscaled to before YOLO
+    "min_box_conf": 0.5,  # predictor confidence threshold; weaker boxes are not worth OCR
+    "min_box_area": 600,  # px at capture resolution (~40x15)
+    "batch_size": 4,  # frames per YOLO call while the sensor is triggered
     "entry_cooldown": 300,  # 5 minutes in seconds
     "gate_open_duration": 15,  # seconds
-    "ocr_config": "--psm 8 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789",
+    "preprocess_backend": "opencv",  # "numba" uses the fused JIT kernel in utils/ocr_pre.py
+    "ocr_whitelist": "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789",
     "plate_format": {
         "prefix_len": 3,
         "digits_len": 3,
@@ -34,23 +61,104 @@ CONFIG = {
 
 
 # ===== Initialize Components =====
+def load_model():
+    """Load the OpenVINO export of the detector, exporting it once if missing"""
+    if CONFIG["model_precision"] == "int8":
+        model_path = CONFIG["openvino_int8_model_path"]
+        # Same arguments as car_exit.py, which shares this export directory
+        export_args = {"int8": True, "dynamic": True, "data": CONFIG["calibration_data"]}
+    else:
+        model_path = CONFIG["openvino_model_path"]
+        # dynamic so detect_stage's multi-frame batches fit the graph
+        export_args = {"half": True, "dynamic": True}
+
+    if not os.path.isdir(model_path):
+        try:
+            precision = CONFIG["model_precision"].upper()
+            print(f"[MODEL] Exporting {CONFIG['model_path']} to OpenVINO {precision}...")
+            model_path = YOLO(CONFIG["model_path"]).export(format="openvino", **export_args)
+        except Exception as e:
+            print(f"[WARNING] OpenVINO export failed, using PyTorch weights: {str(e)}")
+            return YOLO(CONFIG["model_path"])
+    return YOLO(model_path, task="detect")
+
+
 def initialize_system():
+    global ENGINE
+
     # Load YOLOv8 model
-    model = YOLO(CONFIG["model_path"])
+    model = load_model()
+
+    # Keep a single Tesseract engine resident for the lifetime of the program
+    ocr_api = PyTessBaseAPI(psm=PSM.SINGLE_WORD, oem=OEM.LSTM_ONLY)
+    ocr_api.SetVariable("tessedit_char_whitelist", CONFIG["ocr_whitelist"])
 
     # Create directories if they don't exist
     os.makedirs(CONFIG["save_dir"], exist_ok=True)
 
-    # Initialize CSV log file
-    if not os.path.exists(CONFIG["csv_file"]):
-        with open(CONFIG["csv_file"], "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(["Plate Number", "Payment Status", "In time", "Out time"])
+    # Open the CSV log once for the lifetime of the program
+    csv_fh = open(CONFIG["csv_file"], "a", newline="", buffering=1 << 16)
+    if csv_fh.tell() == 0:
+        csv.writer(csv_fh).writerow(["Plate Number", "Payment Status", "In time", "Out time"])
+        csv_fh.flush()
+
+    # One pooled engine for the whole run instead of one per query
+    ENGINE = get_db_connection(pool_size=4, pool_pre_ping=True)
+
+    # Seed the open-plate cache before the first car arrives
+    try:
+        refresh_open_plates()
+    except Exception as e:
+        print(f"[ERROR] Failed to load open entries: {str(e)}")
 
-    return model
+    return model, ocr_api, csv_fh
 
 
 # ===== Serial Communication =====
+class SerialWriter:
+    """Hands Arduino writes to a background thread so callers never block on the tty"""
+
+    def __init__(self, arduino):
+        self.arduino = arduino
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, data):
+        self._queue.put(data)
+
+    def _run(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                return
+            # Drain whatever else is pending and send it in one syscall,
+            # collapsing repeats of the same command
+            pending = [data]
+            while True:
+                try:
+                    data = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if data is None:
+                    self._flush(pending)
+                    return
+                if data != pending[-1]:
+                    pending.append(data)
+            self._flush(pending)
+
+    def _flush(self, pending):
+        try:
+            self.arduino.write(b"".join(pending))
+        except serial.SerialException as e:
+            print(f"[SERIAL ERROR] {str(e)}")
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self.arduino.close()
+
+
 def connect_arduino():
     ports = list(serial.tools.list_ports.comports())
     for port in ports:
@@ -62,37 +170,85 @@ def connect_arduino():
                 )
                 time.sleep(2)  # Allow time for connection
                 print(f"[CONNECTED] Arduino on {port.device}")
-                return arduino
+                return SerialWriter(arduino)
             except serial.SerialException:
                 continue
     print("[ERROR] Arduino not detected or connection failed.")
     return None
 
 
+class GateController:
+    """Non-blocking gate/buzzer timing: commands are sent immediately and
+    tick() sends the matching '0' once the deadline has passed"""
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+
+    def __init__(self, arduino, message_queue):
+        self.arduino = arduino
+        self.message_queue = message_queue
+        self.gate_state = self.CLOSED
+        self.gate_close_at = 0.0
+        self.buzzer_off_at = None
+
+    def open_gate(self, duration):
+        self.arduino.write(b"1")
+        print("[GATE] Opening gate")
+        self.message_queue.add_message("GATE: Opening", (0, 255, 0))
+        self.gate_state = self.OPEN
+        self.gate_close_at = time.monotonic() + duration
+
+    def close_gate(self):
+        self.arduino.write(b"0")  # also silences the buzzer
+        print("[GATE] Closing gate")
+        self.message_queue.add_message("GATE: Closing", (0, 255, 0))
+        self.gate_state = self.CLOSED
+        self.buzzer_off_at = None
+
+    def sound_buzzer(self, duration):
+        self.arduino.write(b"2")
+        print("[ALERT] Buzzer triggered")
+        self.buzzer_off_at = time.monotonic() + duration
+
+    def tick(self):
+        now = time.monotonic()
+        if self.gate_state == self.OPEN and now >= self.gate_close_at:
+            self.close_gate()
+        if self.buzzer_off_at is not None and now >= self.buzzer_off_at:
+            # '0' would also drop a gate that is still open for another car
+            self.arduino.write(b"1" if self.gate_state == self.OPEN else b"0")
+            self.buzzer_off_at = None
+
+    def shutdown(self):
+        if self.gate_state == self.OPEN or self.buzzer_off_at is not None:
+            self.close_gate()
+
+
 # ===== Image Processing =====
+# Built once; only the OCR stage thread uses it
+_CLAHE = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+
+
 def preprocess_plate_image(plate_img):
     """Optimized plate image preprocessing"""
     gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    enhanced = clahe.apply(gray)
-    denoised = cv2.fastNlMeansDenoising(enhanced, h=10)
-    thresh = cv2.adaptiveThreshold(
+    if CONFIG["preprocess_backend"] == "numba" and numba_preprocess is not None:
+        return numba_preprocess(gray)
+    enhanced = _CLAHE.apply(gray)
+    # Edge-preserving bilateral filter: fixed cost per pixel, unlike NL-means patch matching
+    denoised = cv2.bilateralFilter(enhanced, 5, 50, 50)
+    processed = cv2.adaptiveThreshold(
         denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
     )
-    kernel = np.ones((1, 1), np.uint8)
-    processed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
     return processed
 
 
 # ===== OCR Processing =====
-def extract_plate_text(processed_img):
+def extract_plate_text(processed_img, ocr_api):
     """Optimized plate text extraction"""
     try:
-        plate_text = (
-            pytesseract.image_to_string(processed_img, config=CONFIG["ocr_config"])
-            .strip()
-            .replace(" ", "")
-        )
+        ocr_api.SetImage(Image.fromarray(processed_img))
+        plate_text = ocr_api.GetUTF8Text().strip().replace(" ", "")
         plate_text = "".join(c for c in plate_text if c.isalnum())
         return plate_text.upper()
     except Exception as e:
@@ -101,131 +257,252 @@ def extract_plate_text(processed_img):
 
 
 # ===== Plate Validation =====
+# Compiled once from CONFIG so the per-box hot path never re-reads it
+_PLATE_FORMAT = CONFIG["plate_format"]
+_PLATE_MIN_LEN = (
+    _PLATE_FORMAT["prefix_len"] + _PLATE_FORMAT["digits_len"] + _PLATE_FORMAT["suffix_len"]
+)
+_PLATE_RE = re.compile(
+    "{}[A-Z]{{{}}}[0-9]{{{}}}[A-Z]{{{}}}".format(
+        re.escape(_PLATE_FORMAT["required_prefix"]),
+        _PLATE_FORMAT["prefix_len"] - len(_PLATE_FORMAT["required_prefix"]),
+        _PLATE_FORMAT["digits_len"],
+        _PLATE_FORMAT["suffix_len"],
+    )
+)
+
+
 def validate_plate(plate_text):
     """Validate plate format"""
-    if not plate_text:
-        return None
-    if CONFIG["plate_format"]["required_prefix"] not in plate_text:
-        return None
-    start_idx = plate_text.find(CONFIG["plate_format"]["required_prefix"])
-    plate_candidate = plate_text[start_idx:]
-    min_length = (
-        CONFIG["plate_format"]["prefix_len"]
-        + CONFIG["plate_format"]["digits_len"]
-        + CONFIG["plate_format"]["suffix_len"]
-    )
-    if len(plate_candidate) < min_length:
+    if not plate_text or len(plate_text) < _PLATE_MIN_LEN:
         return None
-    prefix = plate_candidate[: CONFIG["plate_format"]["prefix_len"]]
-    digits = plate_candidate[
-        CONFIG["plate_format"]["prefix_len"] : CONFIG["plate_format"]["prefix_len"]
-        + CONFIG["plate_format"]["digits_len"]
-    ]
-    suffix = plate_candidate[
-        CONFIG["plate_format"]["prefix_len"]
-        + CONFIG["plate_format"]["digits_len"] : CONFIG["plate_format"]["prefix_len"]
-        + CONFIG["plate_format"]["digits_len"]
-        + CONFIG["plate_format"]["suffix_len"]
-    ]
-    if (
-        prefix.isalpha()
-        and prefix.isupper()
-        and digits.isdigit()
-        and suffix.isalpha()
-        and suffix.isupper()
-    ):
-        return f"{prefix}{digits}{suffix}"
-    return None
+    match = _PLATE_RE.search(plate_text)
+    return match.group(0) if match else None
 
 
 # ===== Check for Unpaid Duplicate Plates =====
+# Plates with an unpaid, open entry. Rebuilt only when plates_log.csv or
+# car_exit.py's journal changes on disk. payment_processor.py patches the CSV on
+# every payment; car_exit.py journals each exit and folds the journal into the
+# CSV once a minute, so exits are replayed from the journal here.
+_open_plates = set()
+_open_plates_stamp = None
+
+# Pooled engine created once in initialize_system()
+ENGINE = None
+OPEN_PLATES_QUERY = text("""
+    SELECT DISTINCT plate_number
+    FROM vehicle_logs
+    WHERE status = 0
+    AND out_time IS NULL
+""")
+
+
+def refresh_open_plates():
+    """Rebuild the open-plate set from the CSV and database if the CSV changed"""
+    global _open_plates, _open_plates_stamp
+    stamps = []
+    for path in (CONFIG["csv_file"], PLATES_LOG_JOURNAL):
+        try:
+            stat = os.stat(path)
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            stamps.append(None)
+    stamp = tuple(stamps)
+    if stamp[0] is not None and stamp == _open_plates_stamp:
+        return
+
+    open_plates = set()
+
+    # Exits car_exit.py has journalled but not yet written into the CSV
+    exited = set()
+    if stamp[1] is not None:
+        with open(PLATES_LOG_JOURNAL, "r", newline="") as f:
+            for record in csv.reader(f):
+                if len(record) == 3:  # skip a line car_exit.py is still writing
+                    exited.add((record[0], record[1]))
+
+    # Check CSV file
+    if stamp[0] is not None:
+        with open(CONFIG["csv_file"], "r") as f:
+            for row in csv.DictReader(f):
+                if (
+                    row["Payment Status"] == "0"
+                    and not row["Out time"]
+                    and (row["Plate Number"], row["In time"]) not in exited
+                ):
+                    open_plates.add(row["Plate Number"])
+
+    # Check database
+    if ENGINE is not None:
+        with ENGINE.connect() as conn:
+            open_plates.update(conn.execute(OPEN_PLATES_QUERY).scalars())
+
+    _open_plates = open_plates
+    _open_plates_stamp = stamp
+
+
 def check_unpaid_duplicate(plate_number):
     """Check if there's an unpaid entry for this plate number"""
     try:
-        # Check CSV file
-        if os.path.exists(CONFIG["csv_file"]):
-            with open(CONFIG["csv_file"], "r") as f:
-                reader = csv.DictReader(f)
-                for row in reversed(list(reader)):
-                    if (row["Plate Number"] == plate_number and 
-                        row["Payment Status"] == "0" and 
-                        not row["Out time"]):
-                        return True
-
-        # Check database
-        engine = get_db_connection()
-        if engine is not None:
-            query = text("""
-                SELECT COUNT(*) 
-                FROM vehicle_logs 
-                WHERE plate_number = :plate_number 
-                AND status = 0 
-                AND out_time IS NULL
-            """)
-            with engine.connect() as conn:
-                result = conn.execute(query, {"plate_number": plate_number})
-                count = result.scalar()
-                return count > 0
-
-        return False
+        refresh_open_plates()
+        return plate_number in _open_plates
     except Exception as e:
         print(f"[ERROR] Failed to check for unpaid duplicates: {str(e)}")
         return False
 
 
+# ===== Entry Logging =====
+INSERT_ENTRY_QUERY = text("""
+    INSERT INTO vehicle_logs (plate_number, in_time, out_time)
+    VALUES (:plate_number, :in_time, :out_time)
+""")
+
+
+class EntryLogWriter:
+    """Persists entry records to the CSV and database from a background thread
+
+    Records that queue up while a write is in flight go out together: one
+    writerows + flush for the CSV and one executemany insert for the database.
+    """
+
+    def __init__(self, csv_fh, message_queue, max_batch=100):
+        self.csv_fh = csv_fh
+        self.csv_writer = csv.writer(csv_fh)
+        self.message_queue = message_queue
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=1024)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def log(self, plate_number, in_time):
+        self._queue.put((plate_number, in_time))
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            batch = [record]
+            while len(batch) < self.max_batch:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    self._flush(batch)
+                    return
+                batch.append(record)
+            self._flush(batch)
+
+    def _flush(self, batch):
+        plates = ", ".join(plate for plate, _ in batch)
+
+        # Log to CSV; flush so car_exit / payment_processor see the rows
+        try:
+            with locked_plates_log():
+                # car_exit swaps in a rewritten log; append to the current file
+                if is_replaced(self.csv_fh, CONFIG["csv_file"]):
+                    self.csv_fh.close()
+                    self.csv_fh = open(CONFIG["csv_file"], "a", newline="", buffering=1 << 16)
+                    self.csv_writer = csv.writer(self.csv_fh)
+                self.csv_writer.writerows(
+                    [plate, "0", in_time.strftime("%Y-%m-%d %H:%M:%S"), ""]
+                    for plate, in_time in batch
+                )
+                self.csv_fh.flush()
+            print(f"[SAVED] Plate: {plates} logged to CSV")
+        except OSError as e:
+            print(f"[ERROR] Failed to log plate: {plates} to CSV: {str(e)}")
+
+        # Log to database
+        try:
+            if ENGINE is None:
+                raise RuntimeError("no database connection")
+            with ENGINE.begin() as conn:
+                conn.execute(
+                    INSERT_ENTRY_QUERY,
+                    [
+                        {"plate_number": plate, "in_time": in_time, "out_time": None}
+                        for plate, in_time in batch
+                    ],
+                )
+            print(f"[SAVED] Plate: {plates} logged to database")
+        except Exception as e:
+            print(f"[ERROR] Failed to log plate: {plates} to database: {str(e)}")
+            self.message_queue.add_message(f"ERROR: Failed to log {plates}", (0, 0, 255))
+
+    def close(self):
+        """Write out everything still queued, then stop the thread"""
+        self._queue.put(None)
+        self._thread.join()
+
+
 # ===== Message Queue System =====
 class MessageQueue:
     def __init__(self, max_messages=3, message_duration=5):
-        self.messages = deque(maxlen=max_messages)
+        self.max_messages = max_messages
         self.message_duration = message_duration
+        # Ring buffer kept as parallel arrays; empty slots start at -inf so they are never active
+        self.texts = [None] * max_messages
+        self.colors = [None] * max_messages
+        self.timestamps = np.full(max_messages, -np.inf)
+        self.head = 0
+        self._ring = np.arange(max_messages)
+        self._lock = threading.Lock()  # written by worker threads, read by the display loop
     
     def add_message(self, message, color):
-        self.messages.append({
-            'message': message,
-            'color': color,
-            'timestamp': datetime.now()
-        })
+        with self._lock:
+            self.texts[self.head] = message
+            self.colors[self.head] = color
+            self.timestamps[self.head] = time.monotonic()
+            self.head = (self.head + 1) % self.max_messages
     
     def get_active_messages(self):
-        current_time = datetime.now()
-        active_messages = []
-        for msg in self.messages:
-            if (current_time - msg['timestamp']).total_seconds() < self.message_duration:
-                active_messages.append(msg)
-        return active_messages
+        """Return (message, color) pairs that are still on screen, oldest first"""
+        current_time = time.monotonic()
+        with self._lock:
+            order = (self._ring + self.head) % self.max_messages
+            active = order[(current_time - self.timestamps[order]) < self.message_duration]
+            return [(self.texts[i], self.colors[i]) for i in active]
 
 
 # ===== Display Message on Frame =====
+@functools.lru_cache(maxsize=256)
+def _text_size(message):
+    """Memoised cv2.getTextSize; the same few status messages repeat every frame"""
+    return cv2.getTextSize(message, cv2.FONT_HERSHEY_SIMPLEX, 1, 2)[0]
+
+
 def display_messages(frame, message_queue):
-    """Display multiple messages on the frame with background for better visibility"""
-    # Create a copy of the frame
-    display_frame = frame.copy()
+    """Display multiple messages on the frame with background for better visibility
+
+    Draws in place: callers pass a frame they own (plot() output or a fresh capture).
+    """
+    # Get active messages
+    active_messages = message_queue.get_active_messages()
+    if not active_messages:
+        return frame
     
     # Get frame dimensions
     height, width = frame.shape[:2]
     
-    # Get active messages
-    active_messages = message_queue.get_active_messages()
-    
     # Display each message
-    for i, msg in enumerate(active_messages):
-        message = msg['message']
-        color = msg['color']
-        
+    for i, (message, color) in enumerate(active_messages):
         # Calculate position for this message
-        text_size = cv2.getTextSize(message, cv2.FONT_HERSHEY_SIMPLEX, 1, 2)[0]
+        text_size = _text_size(message)
         text_x = (width - text_size[0]) // 2
         text_y = height - 50 - (i * 60)  # Stack messages vertically
         
         # Draw background rectangle
-        cv2.rectangle(display_frame, 
+        cv2.rectangle(frame, 
                      (text_x - 10, text_y - text_size[1] - 10),
                      (text_x + text_size[0] + 10, text_y + 10),
                      (0, 0, 0),
                      -1)
         
         # Draw text
-        cv2.putText(display_frame,
+        cv2.putText(frame,
                     message,
                     (text_x, text_y),
                     cv2.FONT_HERSHEY_SIMPLEX,
@@ -233,14 +510,268 @@ def display_messages(frame, message_queue):
                     color,
                     2)
     
-    return display_frame
+    return frame
+
+
+# ===== Pipeline Helpers =====
+class FrameSlot:
+    """Single-slot mailbox: writers overwrite, the display loop takes the newest value"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = None
+
+    def put(self, value):
+        with self._lock:
+            self._value = value
+
+    def take(self):
+        with self._lock:
+            value, self._value = self._value, None
+            return value
+
+
+def put_latest(q, item):
+    """Put into a bounded queue, dropping the oldest item instead of blocking"""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+def put_until_stopped(q, item, stop_event):
+    """Blocking put that gives up once shutdown has been requested"""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+# ===== Pipeline Stages =====
+def capture_stage(cap, cap_q, message_queue, stop_event):
+    """Stage A: read frames from the camera"""
+    while not stop_event.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            print("[WARNING] Frame capture failed")
+            message_queue.add_message("WARNING: Frame capture failed", (255, 165, 0))
+            stop_event.set()
+            break
+        put_latest(cap_q, frame)
+
+
+def detect_stage(model, cap_q, det_q, feed_slot, stop_event):
+    """Stage B: run YOLO on batches of frames while the sensor is triggered"""
+    frame_batch = deque(maxlen=CONFIG["batch_size"])
+    detect_w, detect_h = CONFIG["detect_size"]
+    # Downscaled YOLO inputs are resized straight into this buffer, so the
+    # steady state allocates no per-frame arrays on our side
+    small_buf = np.empty((CONFIG["batch_size"], detect_h, detect_w, 3), dtype=np.uint8)
+    bgs = cv2.createBackgroundSubtractorMOG2(history=200, detectShadows=False)
+    # Identical arguments on every call let Ultralytics keep its predictor
+    # (device, dtype, letterbox setup) instead of rebuilding it
+    predict_args = {
+        "stream": True,
+        "half": True,
+        "imgsz": 640,
+        "conf": CONFIG["min_box_conf"],
+        "verbose": False,
+    }
+    while not stop_event.is_set():
+        try:
+            frame = cap_q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+        # Simulate ultrasonic sensor
+        distance = random.choice([random.randint(10, 40), random.randint(60, 150)])
+
+        # YOLO letterboxes to 640 anyway; downscale here so fewer pixels are
+        # preprocessed and copied, and map boxes back to full-res for OCR
+        cv2.resize(frame, (detect_w, detect_h), dst=small_buf[0], interpolation=cv2.INTER_LINEAR)
+
+        # Background subtraction runs on every frame to keep its model current;
+        # YOLO only runs when the sensor fires and something actually moved
+        motion = bgs.apply(small_buf[0]).mean()
+
+        if distance > CONFIG["ultrasonic_threshold"] or motion < CONFIG["motion_threshold"]:
+            # Add system status
+            cv2.putText(
+                frame,
+                "System: WAITING",
+                (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.7,
+                (255, 165, 0),
+                2,
+            )
+            feed_slot.put(frame)
+            continue
+
+        # Gather a short burst of frames so YOLO runs once per batch
+        frame_batch.clear()
+        frame_batch.append(frame)
+        while len(frame_batch) < CONFIG["batch_size"]:
+            try:
+                extra_frame = cap_q.get(timeout=0.05)
+            except queue.Empty:
+                break
+            cv2.resize(
+                extra_frame,
+                (detect_w, detect_h),
+                dst=small_buf[len(frame_batch)],
+                interpolation=cv2.INTER_LINEAR,
+            )
+            frame_batch.append(extra_frame)
+        small_batch = [small_buf[k] for k in range(len(frame_batch))]
+
+        # Run YOLO detection; results stream out per frame as they are post-processed
+        start_time = time.time()
+        result = None
+        for batch_frame, result in zip(frame_batch, model.predict(small_batch, **predict_args)):
+            if len(result.boxes) > 0:
+                scale = (batch_frame.shape[1] / detect_w, batch_frame.shape[0] / detect_h)
+                put_until_stopped(det_q, (batch_frame, result.boxes, scale), stop_event)
+        detection_time = time.time() - start_time
+
+        # Show the newest frame of the batch at capture resolution
+        annotated_frame = cv2.resize(result.plot(), (frame.shape[1], frame.shape[0]))
+
+        # Add detection time and system status
+        cv2.putText(
+            annotated_frame,
+            f"Detection: {detection_time:.2f}s",
+            (10, 30),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.7,
+            (0, 255, 0),
+            2,
+        )
+        cv2.putText(
+            annotated_frame,
+            "System: ACTIVE",
+            (10, 60),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.7,
+            (0, 255, 0),
+            2,
+        )
+        feed_slot.put(annotated_frame)
+
+
+def ocr_stage(ocr_api, det_q, ocr_q, crop_slot, message_queue, stop_event):
+    """Stage C: crop, preprocess, OCR and validate each detected plate"""
+    while not stop_event.is_set():
+        try:
+            frame, boxes, (sx, sy) = det_q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+        # Most confident boxes first; low-confidence boxes were already dropped
+        # by the predictor and tiny ones are almost always OCR failures
+        confs = boxes.conf.tolist()
+        for i in sorted(range(len(confs)), key=confs.__getitem__, reverse=True):
+            # Boxes come from the downscaled frame; crop the full-res one for OCR
+            x1, y1, x2, y2 = boxes.xyxy[i].tolist()
+            x1, x2 = int(x1 * sx), int(x2 * sx)
+            y1, y2 = int(y1 * sy), int(y2 * sy)
+            if (x2 - x1) * (y2 - y1) < CONFIG["min_box_area"]:
+                continue
+
+            plate_img = frame[y1:y2, x1:x2]
+            processed_img = preprocess_plate_image(plate_img)
+            plate_text = extract_plate_text(processed_img, ocr_api)
+            print(f"[OCR] Raw text: {plate_text}")
+
+            valid_plate = validate_plate(plate_text)
+            if valid_plate:
+                print(f"[VALID] Plate detected: {valid_plate}")
+                message_queue.add_message(f"Plate Detected: {valid_plate}", (0, 255, 255))
+                crop_slot.put((plate_img, processed_img))
+                put_until_stopped(ocr_q, valid_plate, stop_event)
+                break  # one plate per frame is enough for the vote
+
+
+def actuation_stage(arduino, entry_log, ocr_q, message_queue, stop_event):
+    """Stage D: vote on plates, log the entry and drive the gate"""
+    gate = GateController(arduino, message_queue) if arduino else None
+    plate_buffer = []
+    last_saved_plate = None
+    last_entry_time = 0
+
+    while not stop_event.is_set():
+        # Close the gate / stop the buzzer once their timers run out
+        if gate:
+            gate.tick()
+
+        try:
+            plate_buffer.append(ocr_q.get(timeout=0.1))
+        except queue.Empty:
+            continue
+
+        if len(plate_buffer) < CONFIG["plate_buffer_size"]:
+            continue
+
+        most_common = Counter(plate_buffer).most_common(1)[0][0]
+        plate_buffer.clear()
+        current_time = time.time()
+
+        # Check for unpaid duplicates
+        if check_unpaid_duplicate(most_common):
+            print(f"[DENIED] Unpaid entry exists for plate: {most_common}")
+            message_queue.add_message(
+                f"DENIED: Unpaid entry exists for {most_common}",
+                (0, 0, 255)
+            )
+            if gate:
+                gate.sound_buzzer(3)
+            continue
+
+        # Check cooldown
+        if (
+            most_common != last_saved_plate
+            or (current_time - last_entry_time) > CONFIG["entry_cooldown"]
+        ):
+            # Hand the record to the writer thread; the CSV and database writes
+            # happen off the actuation loop
+            entry_log.log(most_common, datetime.now())
+            _open_plates.add(most_common)
+            print(f"[ACCESS GRANTED] Plate: {most_common}")
+            message_queue.add_message(
+                f"ACCESS GRANTED: {most_common}",
+                (0, 255, 0)
+            )
+
+            # Control gate; it is closed later by gate.tick()
+            if gate:
+                gate.open_gate(CONFIG["gate_open_duration"])
+
+            last_saved_plate = most_common
+            last_entry_time = current_time
+        else:
+            print("[SKIPPED] Duplicate plate within cooldown period")
+            message_queue.add_message(
+                f"SKIPPED: {most_common} within cooldown",
+                (255, 165, 0)
+            )
+
+    if gate:
+        gate.shutdown()
 
 
 # ===== Main Loop =====
 def main():
-    model = initialize_system()
+    model, ocr_api, csv_fh = initialize_system()
     arduino = connect_arduino()
     message_queue = MessageQueue(max_messages=3, message_duration=5)
+    entry_log = EntryLogWriter(csv_fh, message_queue)
 
     if not arduino:
         print("[WARNING] Running in simulation mode without Arduino")
@@ -254,165 +785,48 @@ def main():
 
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-
-    plate_buffer = []
-    last_saved_plate = None
-    last_entry_time = 0
+    # Don't let V4L2 queue stale frames; the capture stage already keeps only the newest
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    # Bounded queues between stages keep end-to-end latency low
+    cap_q = queue.Queue(maxsize=2)
+    det_q = queue.Queue(maxsize=2)
+    ocr_q = queue.Queue(maxsize=2)
+    stop_event = threading.Event()
+    feed_slot = FrameSlot()
+    crop_slot = FrameSlot()
+
+    workers = [
+        threading.Thread(target=capture_stage, args=(cap, cap_q, message_queue, stop_event)),
+        threading.Thread(target=detect_stage, args=(model, cap_q, det_q, feed_slot, stop_event)),
+        threading.Thread(
+            target=ocr_stage,
+            args=(ocr_api, det_q, ocr_q, crop_slot, message_queue, stop_event),
+        ),
+        threading.Thread(
+            target=actuation_stage,
+            args=(arduino, entry_log, ocr_q, message_queue, stop_event),
+        ),
+    ]
+    for worker in workers:
+        worker.start()
 
     print("[SYSTEM] Ready. Press 'q' to exit.")
     message_queue.add_message("System Ready", (0, 255, 0))
 
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("[WARNING] Frame capture failed")
-                message_queue.add_message("WARNING: Frame capture failed", (255, 165, 0))
-                break
-
-            # Simulate ultrasonic sensor
-            distance = random.choice([random.randint(10, 40), random.randint(60, 150)])
-
-            if distance <= CONFIG["ultrasonic_threshold"]:
-                # Run YOLO detection
-                start_time = time.time()
-                results = model(frame, verbose=False)
-                detection_time = time.time() - start_time
-
-                if len(results[0].boxes) > 0:
-                    for box in results[0].boxes:
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        plate_img = frame[y1:y2, x1:x2]
-                        processed_img = preprocess_plate_image(plate_img)
-                        plate_text = extract_plate_text(processed_img)
-                        print(f"[OCR] Raw text: {plate_text}")
-
-                        valid_plate = validate_plate(plate_text)
-                        if valid_plate:
-                            print(f"[VALID] Plate detected: {valid_plate}")
-                            plate_buffer.append(valid_plate)
-                            message_queue.add_message(f"Plate Detected: {valid_plate}", (0, 255, 255))
-
-                            cv2.imshow("Plate", plate_img)
-                            cv2.imshow("Processed", processed_img)
-
-                            if len(plate_buffer) >= CONFIG["plate_buffer_size"]:
-                                most_common = Counter(plate_buffer).most_common(1)[0][0]
-                                current_time = time.time()
-
-                                # Check for unpaid duplicates
-                                if check_unpaid_duplicate(most_common):
-                                    print(f"[DENIED] Unpaid entry exists for plate: {most_common}")
-                                    message_queue.add_message(
-                                        f"DENIED: Unpaid entry exists for {most_common}",
-                                        (0, 0, 255)
-                                    )
-                                    if arduino:
-                                        arduino.write(b"2")
-                                        print("[ALERT] Buzzer triggered")
-                                        time.sleep(3)
-                                        arduino.write(b"0")
-                                    plate_buffer.clear()
-                                    continue
-
-                                # Check cooldown
-                                if (
-                                    most_common != last_saved_plate
-                                    or (current_time - last_entry_time)
-                                    > CONFIG["entry_cooldown"]
-                                ):
-                                    # Log to CSV and Database
-                                    current_time = time.strftime("%Y-%m-%d %H:%M:%S")
-                                    with open(CONFIG["csv_file"], "a", newline="") as f:
-                                        writer = csv.writer(f)
-                                        writer.writerow(
-                                            [
-                                                most_common,
-                                                "0",
-                                                current_time,
-                                                "",
-                                            ]
-                                        )
-                                    print(f"[SAVED] Plate: {most_common} logged to CSV")
-                                    message_queue.add_message(
-                                        f"SAVED: {most_common} logged to CSV",
-                                        (0, 255, 0)
-                                    )
-
-                                    # Log to database
-                                    if save_vehicle_entry(most_common):
-                                        print(f"[SAVED] Plate: {most_common} logged to database")
-                                        message_queue.add_message(
-                                            f"ACCESS GRANTED: {most_common}",
-                                            (0, 255, 0)
-                                        )
-                                    else:
-                                        print(f"[ERROR] Failed to log plate: {most_common} to database")
-                                        message_queue.add_message(
-                                            f"ERROR: Failed to log {most_common}",
-                                            (0, 0, 255)
-                                        )
-
-                                    # Control gate
-                                    if arduino:
-                                        arduino.write(b"1")
-                                        print("[GATE] Opening gate")
-                                        message_queue.add_message("GATE: Opening", (0, 255, 0))
-                                        time.sleep(CONFIG["gate_open_duration"])
-                                        arduino.write(b"0")
-                                        print("[GATE] Closing gate")
-                                        message_queue.add_message("GATE: Closing", (0, 255, 0))
-
-                                    last_saved_plate = most_common
-                                    last_entry_time = current_time
-                                else:
-                                    print("[SKIPPED] Duplicate plate within cooldown period")
-                                    message_queue.add_message(
-                                        f"SKIPPED: {most_common} within cooldown",
-                                        (255, 165, 0)
-                                    )
-
-                                plate_buffer.clear()
-
-                annotated_frame = results[0].plot()
-                # Display all active messages
-                annotated_frame = display_messages(annotated_frame, message_queue)
-                
-                # Add detection time and system status
-                cv2.putText(
-                    annotated_frame,
-                    f"Detection: {detection_time:.2f}s",
-                    (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    (0, 255, 0),
-                    2,
-                )
-                cv2.putText(
-                    annotated_frame,
-                    "System: ACTIVE",
-                    (10, 60),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    (0, 255, 0),
-                    2,
-                )
-            else:
-                annotated_frame = frame
+        # HighGUI must stay on the main thread
+        while not stop_event.is_set():
+            annotated_frame = feed_slot.take()
+            if annotated_frame is not None:
                 # Display all active messages
                 annotated_frame = display_messages(annotated_frame, message_queue)
-                # Add system status
-                cv2.putText(
-                    annotated_frame,
-                    "System: WAITING",
-                    (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    (255, 165, 0),
-                    2,
-                )
+                cv2.imshow("Webcam Feed", annotated_frame)
 
-            cv2.imshow("Webcam Feed", annotated_frame)
+            crops = crop_slot.take()
+            if crops is not None:
+                cv2.imshow("Plate", crops[0])
+                cv2.imshow("Processed", crops[1])
 
             if cv2.waitKey(1) & 0xFF == ord("q"):
                 break
@@ -421,7 +835,13 @@ def main():
         print("\n[SYSTEM] Shutting down...")
         message_queue.add_message("System Shutting Down", (255, 165, 0))
     finally:
+        stop_event.set()
+        for worker in workers:
+            worker.join()
         cap.release()
+        ocr_api.End()
+        entry_log.close()
+        entry_log.csv_fh.close()
         if arduino:
             arduino.close()
         cv2.destroyAllWindows()
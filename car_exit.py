@@ -1,43 +1,62 @@
+import os
+
+# Plate crops are tiny; Tesseract's OpenMP fan-out only adds overhead
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
 import cv2
 from ultralytics import YOLO
-import pytesseract
-import os
+import torch
+from tesserocr import PyTessBaseAPI, PSM, OEM
+from PIL import Image
 import time
+import argparse
+import threading
+import queue
 import serial
 import serial.tools.list_ports
 import csv
-from collections import Counter, deque
+import re
+import numpy as np
+from collections import defaultdict, deque
 from datetime import datetime, timedelta
 from utils.data_handler import get_db_connection, update_vehicle_exit, save_vehicle_entry
+from utils.plates_log import locked_plates_log, PLATES_LOG_JOURNAL
 from sqlalchemy import create_engine, text
 
+try:
+    from utils.ocr_pre import gray_blur_otsu
+except ImportError:  # numba is optional; fall back to the OpenCV chain
+    gray_blur_otsu = None
+
 # ===== Message Queue System =====
 class MessageQueue:
     def __init__(self, max_messages=3, message_duration=5):
         self.messages = deque(maxlen=max_messages)
         self.message_duration = message_duration
+        self._lock = threading.Lock()  # gate threads add messages too
     
     def add_message(self, message, color):
-        self.messages.append({
-            'message': message,
-            'color': color,
-            'timestamp': datetime.now()
-        })
+        with self._lock:
+            self.messages.append({
+                'message': message,
+                'color': color,
+                'expires_at': time.monotonic() + self.message_duration
+            })
     
     def get_active_messages(self):
-        current_time = datetime.now()
-        active_messages = []
-        for msg in self.messages:
-            if (current_time - msg['timestamp']).total_seconds() < self.message_duration:
-                active_messages.append(msg)
-        return active_messages
+        # Every message lives equally long, so expired ones are always at the front
+        now = time.monotonic()
+        with self._lock:
+            while self.messages and self.messages[0]['expires_at'] <= now:
+                self.messages.popleft()
+            return list(self.messages)
 
 # ===== Display Message on Frame =====
 def display_messages(frame, message_queue):
-    """Display multiple messages on the frame with background for better visibility"""
-    # Create a copy of the frame
-    display_frame = frame.copy()
-    
+    """Display multiple messages on the frame with background for better visibility
+
+    Draws in place; callers pass a frame they no longer need unannotated.
+    """
     # Get frame dimensions
     height, width = frame.shape[:2]
     
@@ -55,14 +74,14 @@ def display_messages(frame, message_queue):
         text_y = height - 50 - (i * 60)  # Stack messages vertically
         
         # Draw background rectangle
-        cv2.rectangle(display_frame, 
+        cv2.rectangle(frame, 
                      (text_x - 10, text_y - text_size[1] - 10),
                      (text_x + text_size[0] + 10, text_y + 10),
                      (0, 0, 0),
                      -1)
         
         # Draw text
-        cv2.putText(display_frame,
+        cv2.putText(frame,
                     message,
                     (text_x, text_y),
                     cv2.FONT_HERSHEY_SIMPLEX,
@@ -70,15 +89,169 @@ def display_messages(frame, message_queue):
                     color,
                     2)
     
-    return display_frame
+    return frame
+
+# Load YOLOv8 model: FP16 on a GPU, an INT8 OpenVINO export on CPU-only gates
+model_path = './best.pt'
+int8_model_path = './best_int8_openvino_model/'
+if torch.cuda.is_available():
+    model = YOLO(model_path)
+    model.fuse()
+    predict_args = {"half": True, "device": 0}
+else:
+    if not os.path.isdir(int8_model_path):
+        try:
+            print(f"[MODEL] Exporting {model_path} to OpenVINO INT8...")
+            # dynamic so the batched frame lists below can vary in size; car_entry.py
+            # shares this directory and exports it the same way
+            int8_model_path = YOLO(model_path).export(
+                format='openvino', int8=True, dynamic=True, data='./license_plate.yaml'
+            )
+        except Exception as e:
+            print(f"[WARNING] INT8 export failed, using PyTorch weights: {str(e)}")
+    if os.path.isdir(int8_model_path):
+        model = YOLO(int8_model_path, task='detect')
+    else:
+        model = YOLO(model_path)
+    predict_args = {}
+
+# Plates stay large enough to find at 384 px; boxes still come back in
+# full-resolution coordinates, so crops for OCR keep their detail
+predict_args.update(imgsz=384, conf=0.25)
+
+# Keep one Tesseract engine resident instead of spawning a subprocess per crop
+ocr_whitelist = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+ocr_api = PyTessBaseAPI(psm=PSM.SINGLE_WORD, oem=OEM.DEFAULT)
+ocr_api.SetVariable("tessedit_char_whitelist", ocr_whitelist)
+
+def read_plates(crops):
+    """OCR a frame's plate crops on the resident engine"""
+    texts = []
+    for crop in crops:
+        ocr_api.SetImage(Image.fromarray(crop))
+        texts.append(ocr_api.GetUTF8Text().strip().replace(" ", ""))
+    return texts
+
+# One pooled engine and the statements it runs, created once at startup
+ENGINE = get_db_connection(pool_size=4, pool_pre_ping=True, pool_recycle=1800)
+UPDATE_EXIT_QUERY = text("""
+    UPDATE vehicle_logs 
+    SET out_time = :out_time
+    WHERE plate_number = :plate_number 
+    AND status = 1
+    AND out_time IS NULL
+    RETURNING id
+""")
+INSERT_UNAUTHORIZED_QUERY = text("""
+    INSERT INTO unauthorized_exits (plate_number, timestamp)
+    VALUES (:plate_number, :timestamp)
+""")
 
-# Load YOLOv8 model
-model = YOLO('./best.pt')
+# Plate format: RA + letter, three digits, letter (e.g. RAB123C)
+PLATE_RE = re.compile(r'RA[A-Z]\d{3}[A-Z]')
 
 # CSV log files
 authorized_csv = './database/plates_log.csv'
 unauthorized_csv = './database/unauthorized_exits.csv'
 
+# ===== In-memory plate log =====
+# plates_log.csv is read once into `rows`, with `open_by_plate` mapping each
+# plate to its paid rows that have no exit time yet (oldest first). Exits are applied in memory and
+# appended to a journal; the CSV is only rewritten by consolidate_log(). The
+# entry system and payment processor still write the CSV, so it is re-read (and
+# the journal replayed on top) whenever its stat stamp changes. Readers that
+# need Out times sooner replay the journal themselves.
+log_fields = ['Plate Number', 'Payment Status', 'In time', 'Out time']
+journal_path = PLATES_LOG_JOURNAL
+consolidate_interval = 60  # seconds
+rows = []
+open_by_plate = {}
+log_stamp = None
+log_lock = threading.Lock()  # shared with the consolidation timer thread
+journal = open(journal_path, 'a', newline='')
+journal_writer = csv.writer(journal)
+
+def stat_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def load_log():
+    """Read the CSV into memory and replay journalled exits that are not in it yet"""
+    global rows, open_by_plate, log_stamp
+    stamp = stat_stamp(authorized_csv)
+    new_rows = []
+    if stamp is not None:
+        with open(authorized_csv, 'r', newline='') as f:
+            new_rows = list(csv.DictReader(f))
+
+    journal.flush()
+    exits = {}
+    with open(journal_path, 'r', newline='') as f:
+        for plate, in_time, out_time in csv.reader(f):
+            exits[(plate, in_time)] = out_time
+
+    index = {}
+    for row in new_rows:
+        if row['Out time']:
+            continue
+        out_time = exits.get((row['Plate Number'], row['In time']))
+        if out_time:
+            row['Out time'] = out_time
+        elif row['Payment Status'] == '1':
+            index.setdefault(row['Plate Number'], deque()).append(row)
+
+    rows, open_by_plate, log_stamp = new_rows, index, stamp
+
+def refresh_log():
+    """Reload the in-memory log if another process changed the CSV"""
+    if stat_stamp(authorized_csv) != log_stamp:
+        load_log()
+
+def consolidate_log():
+    """Fold the journal back into plates_log.csv and start a fresh journal
+
+    The rewritten log goes to a temp file that replaces the CSV in one step. This
+    happens under the writer lock the entry system and payment processor also
+    take, so none of their appends or status patches land in between and get lost.
+    """
+    global log_stamp
+    with log_lock, locked_plates_log():
+        journal.flush()
+        if os.path.getsize(journal_path) == 0:
+            return
+        # Re-read under the lock so every other writer's changes are carried over
+        load_log()
+        if log_stamp is None:
+            return
+        tmp_path = authorized_csv + '.tmp'
+        with open(tmp_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=log_fields)
+            writer.writeheader()
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, authorized_csv)
+        journal.truncate(0)
+        log_stamp = stat_stamp(authorized_csv)
+
+def consolidate_periodically():
+    global consolidate_timer
+    try:
+        consolidate_log()
+    except Exception as e:
+        print(f"[ERROR] Failed to consolidate plate log: {str(e)}")
+    consolidate_timer = threading.Timer(consolidate_interval, consolidate_periodically)
+    consolidate_timer.daemon = True
+    consolidate_timer.start()
+
+load_log()
+consolidate_timer = threading.Timer(consolidate_interval, consolidate_periodically)
+consolidate_timer.daemon = True
+consolidate_timer.start()
+
 # ===== Auto-detect Arduino Serial Port =====
 def detect_arduino_port():
     ports = list(serial.tools.list_ports.comports())
@@ -87,111 +260,155 @@ def detect_arduino_port():
             return port.device
     return None
 
-arduino_port = detect_arduino_port()
-if arduino_port:
+# Last port the Arduino was found on, tried before enumerating USB devices
+arduino_port_cache = './database/.arduino_port'
+
+def open_arduino():
+    try:
+        with open(arduino_port_cache, 'r') as f:
+            cached_port = f.read().strip()
+    except OSError:
+        cached_port = None
+    if cached_port:
+        try:
+            return cached_port, serial.Serial(cached_port, 9600, timeout=1)
+        except serial.SerialException:
+            pass
+
+    port = detect_arduino_port()
+    if port is None:
+        return None, None
+    connection = serial.Serial(port, 9600, timeout=1)
+    with open(arduino_port_cache, 'w') as f:
+        f.write(port)
+    return port, connection
+
+arduino_port, arduino = open_arduino()
+if arduino:
     print(f"[CONNECTED] Arduino on {arduino_port}")
-    arduino = serial.Serial(arduino_port, 9600, timeout=1)
     time.sleep(2)
 else:
     print("[ERROR] Arduino not detected.")
     arduino = None
 
+# ===== Gate control =====
+# Gate and buzzer timing runs on worker threads so the camera loop never sleeps.
+# gate_lock serialises every write and the shared gate state.
+gate_lock = threading.Lock()
+gate_close_at = 0.0
+gate_thread = None  # set while the gate is open
+
+def gate_cycle(message_queue):
+    global gate_thread
+    while True:
+        with gate_lock:
+            remaining = gate_close_at - time.monotonic()
+            if remaining <= 0:
+                arduino.write(b'0')  # Close gate
+                gate_thread = None
+                break
+        time.sleep(remaining)
+    print("[GATE] Closing gate (sent '0')")
+    message_queue.add_message("GATE: Closing", (0, 255, 0))
+
+def open_gate(duration, message_queue):
+    """Open the gate and close it `duration` seconds after the latest opening"""
+    global gate_close_at, gate_thread
+    with gate_lock:
+        arduino.write(b'1')  # Open gate
+        gate_close_at = time.monotonic() + duration
+        if gate_thread is None:
+            gate_thread = threading.Thread(target=gate_cycle, args=(message_queue,), daemon=True)
+            gate_thread.start()
+    print("[GATE] Opening gate (sent '1')")
+    message_queue.add_message("GATE: Opening", (0, 255, 0))
+
+def buzzer_cycle(duration):
+    time.sleep(duration)
+    with gate_lock:
+        arduino.write(b'0')  # Stop buzzer
+        if gate_thread is not None:
+            arduino.write(b'1')  # '0' also closes the gate; keep it open
+
+def sound_buzzer(duration, message_queue):
+    with gate_lock:
+        arduino.write(b'2')  # Trigger warning buzzer
+    print("[ALERT] Buzzer triggered (sent '2')")
+    message_queue.add_message("ALERT: Unauthorized exit", (0, 0, 255))
+    threading.Thread(target=buzzer_cycle, args=(duration,), daemon=True).start()
+
 # ===== Check payment status and update exit time =====
 def process_exit(plate_number, message_queue):
-    if not os.path.exists(authorized_csv):
-        print("[ERROR] Log file does not exist.")
-        message_queue.add_message("ERROR: Log file does not exist", (0, 0, 255))
-        return False
-
-    # Read all rows
-    rows = []
-    with open(authorized_csv, 'r') as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-
-    # Find the latest entry for this plate that hasn't exited
-    for row in reversed(rows):
-        if row['Plate Number'] == plate_number and row['Payment Status'] == '1' and not row['Out time']:
-            # Update exit time
+    with log_lock:
+        refresh_log()
+        if log_stamp is None:
+            print("[ERROR] Log file does not exist.")
+            message_queue.add_message("ERROR: Log file does not exist", (0, 0, 255))
+            return False
+
+        # Take the latest paid entry for this plate that hasn't exited
+        open_rows = open_by_plate.get(plate_number)
+        exit_row = open_rows.pop() if open_rows else None
+        if exit_row is not None:
+            # Update exit time in memory and record it in the journal
             current_time = datetime.now()
             current_time_str = current_time.strftime("%Y-%m-%d %H:%M:%S")
-            row['Out time'] = current_time_str
-            
-            # Write back all rows
-            with open(authorized_csv, 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=['Plate Number', 'Payment Status', 'In time', 'Out time'])
-                writer.writeheader()
-                writer.writerows(rows)
-            
-            # Update database with out_time only
-            engine = get_db_connection()
-            if engine is not None:
-                query = text("""
-                    UPDATE vehicle_logs 
-                    SET out_time = :out_time
-                    WHERE plate_number = :plate_number 
-                    AND status = 1
-                    AND out_time IS NULL
-                    RETURNING id
-                """)
-                try:
-                    with engine.connect() as conn:
-                        result = conn.execute(query, {
-                            "plate_number": plate_number,
-                            "out_time": current_time
-                        })
-                        conn.commit()
-                        if result.rowcount > 0:
-                            print(f"[DATABASE] Exit time updated in database for {plate_number}")
-                            message_queue.add_message(f"EXIT GRANTED: {plate_number}", (0, 255, 0))
-                        else:
-                            print(f"[DATABASE] No matching record found for {plate_number}")
-                            message_queue.add_message(f"ERROR: No record found for {plate_number}", (0, 0, 255))
-                except Exception as e:
-                    print(f"[DATABASE ERROR] Failed to update exit time: {str(e)}")
-                    message_queue.add_message("ERROR: Database update failed", (0, 0, 255))
-            else:
-                print(f"[ERROR] Failed to connect to database for exit time update")
-                message_queue.add_message("ERROR: Database connection failed", (0, 0, 255))
-            
-            print(f"[SUCCESS] Exit time updated for {plate_number}")
-            return True
+            exit_row['Out time'] = current_time_str
+            journal_writer.writerow([plate_number, exit_row['In time'], current_time_str])
+            journal.flush()
+
+    if exit_row is not None:
+        # Update database with out_time only
+        if ENGINE is not None:
+            try:
+                with ENGINE.begin() as conn:
+                    result = conn.execute(UPDATE_EXIT_QUERY, {
+                        "plate_number": plate_number,
+                        "out_time": current_time
+                    })
+                    if result.rowcount > 0:
+                        print(f"[DATABASE] Exit time updated in database for {plate_number}")
+                        message_queue.add_message(f"EXIT GRANTED: {plate_number}", (0, 255, 0))
+                    else:
+                        print(f"[DATABASE] No matching record found for {plate_number}")
+                        message_queue.add_message(f"ERROR: No record found for {plate_number}", (0, 0, 255))
+            except Exception as e:
+                print(f"[DATABASE ERROR] Failed to update exit time: {str(e)}")
+                message_queue.add_message("ERROR: Database update failed", (0, 0, 255))
+        else:
+            print(f"[ERROR] Failed to connect to database for exit time update")
+            message_queue.add_message("ERROR: Database connection failed", (0, 0, 255))
+        
+        print(f"[SUCCESS] Exit time updated for {plate_number}")
+        return True
 
     print(f"[ERROR] No valid entry found for {plate_number}")
     message_queue.add_message(f"DENIED: No valid entry for {plate_number}", (0, 0, 255))
     return False
 
 # ===== Log unauthorized exit =====
+# Kept open for the whole run; line buffering pushes each alert straight to disk
+unauth_fh = open(unauthorized_csv, 'a', newline='', buffering=1)
+unauth_writer = csv.writer(unauth_fh)
+if unauth_fh.tell() == 0:
+    unauth_writer.writerow(['Plate Number', 'Timestamp'])
+
 def log_unauthorized_exit(plate_number, message_queue):
-    # Create file if it doesn't exist
-    if not os.path.exists(unauthorized_csv):
-        with open(unauthorized_csv, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Plate Number', 'Timestamp'])
-    
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     # Append new entry to CSV
-    with open(unauthorized_csv, 'a', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([plate_number, current_time])
+    unauth_writer.writerow([plate_number, current_time])
     
     # Log to database
-    engine = get_db_connection()
-    if engine is not None:
-        query = text("""
-            INSERT INTO unauthorized_exits (plate_number, timestamp)
-            VALUES (:plate_number, :timestamp)
-        """)
+    if ENGINE is not None:
         try:
-            with engine.connect() as conn:
-                conn.execute(query, {
+            with ENGINE.begin() as conn:
+                conn.execute(INSERT_UNAUTHORIZED_QUERY, {
                     "plate_number": plate_number,
                     "timestamp": current_time
                 })
-                conn.commit()
-                print(f"[DATABASE] Unauthorized exit logged in database for {plate_number}")
-                message_queue.add_message(f"SECURITY ALERT: Unauthorized exit logged for {plate_number}", (0, 0, 255))
+            print(f"[DATABASE] Unauthorized exit logged in database for {plate_number}")
+            message_queue.add_message(f"SECURITY ALERT: Unauthorized exit logged for {plate_number}", (0, 0, 255))
         except Exception as e:
             print(f"[DATABASE ERROR] Failed to log unauthorized exit: {str(e)}")
             message_queue.add_message("ERROR: Failed to log unauthorized exit", (0, 0, 255))
@@ -202,98 +419,181 @@ def log_unauthorized_exit(plate_number, message_queue):
     print(f"[SECURITY ALERT] Unauthorized exit logged for {plate_number}")
 
 # ===== Webcam and Main Loop =====
+parser = argparse.ArgumentParser(description="Exit gate plate recognition")
+parser.add_argument('--debug', action='store_true', help="show the plate crop and OCR input windows")
+args = parser.parse_args()
+display_interval = 0.1  # seconds; caps the feed window at 10 Hz
+last_show = 0.0
+
 cap = cv2.VideoCapture(0)
-plate_buffer = []
+# Don't let V4L2 queue stale frames behind the capture thread
+cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+# Running vote over recent reads; a plate is acted on once it is read 3 times
+plate_votes = defaultdict(int)
+best_count = 0
+best_plate = None
 message_queue = MessageQueue(max_messages=3, message_duration=5)
 
+# Frames are read on their own thread and run through YOLO in batches. The
+# queue holds a single batch and drops the oldest frame when full, so the
+# loop always works on the newest frames
+batch_size = 4
+frame_queue = queue.Queue(maxsize=batch_size)
+capture_stop = threading.Event()
+
+def enqueue_frame(frame):
+    """Queue a frame, dropping the oldest one if detection has fallen behind"""
+    if frame_queue.full():
+        try:
+            frame_queue.get_nowait()
+        except queue.Empty:
+            pass
+    frame_queue.put(frame)
+
+def capture_frames():
+    while not capture_stop.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            enqueue_frame(None)  # tell the main loop capture has failed
+            return
+        enqueue_frame(frame)
+
+# Warm up at the batch size used in the loop so the first real batch isn't slow
+frame_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480
+frame_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+model([np.zeros((frame_h, frame_w, 3), dtype=np.uint8)] * batch_size, verbose=False, **predict_args)
+
+# Skip YOLO on frames where nothing moved: a 64x48 grayscale thumbnail is
+# compared against a running average of the scene
+motion_threshold = 2.0  # mean absolute difference (0-255)
+background = None
+
+def has_motion(frame):
+    global background
+    small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (64, 48)).astype(np.float32)
+    if background is None:
+        background = small
+        return True
+    diff = cv2.absdiff(background, small).mean()
+    # Slow EMA so lighting drift is absorbed but a car is not
+    cv2.accumulateWeighted(small, background, 0.05)
+    return diff >= motion_threshold
+
+capture_thread = threading.Thread(target=capture_frames, daemon=True)
+capture_thread.start()
+
 print("[EXIT SYSTEM] Ready. Press 'q' to quit.")
 message_queue.add_message("Exit System Ready", (0, 255, 0))
 
 while True:
-    ret, frame = cap.read()
-    if not ret:
+    # Block for one frame, then take whatever else is already waiting
+    frames = [frame_queue.get()]
+    while frames[-1] is not None and len(frames) < batch_size:
+        try:
+            frames.append(frame_queue.get_nowait())
+        except queue.Empty:
+            break
+    if frames[-1] is None:
         print("[WARNING] Frame capture failed")
         message_queue.add_message("WARNING: Frame capture failed", (255, 165, 0))
         break
 
-    results = model(frame)
+    moving = [frame for frame in frames if has_motion(frame)]
+    results = model(moving, **predict_args) if moving else []
 
-    for result in results:
-        for box in result.boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
+    for frame, result in zip(moving, results):
+        # Preprocess every crop, then OCR them together
+        plate_imgs = []
+        threshes = []
+        # One device->host copy for all of the frame's boxes
+        xyxy = result.boxes.xyxy.cpu().numpy().astype(np.int32)
+        for x1, y1, x2, y2 in xyxy:
             plate_img = frame[y1:y2, x1:x2]
 
             # Preprocessing
-            gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
-            blur = cv2.GaussianBlur(gray, (5, 5), 0)
-            thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-
-            # OCR
-            plate_text = pytesseract.image_to_string(
-                thresh, config='--psm 8 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-            ).strip().replace(" ", "")
-
-            if "RA" in plate_text:
-                start_idx = plate_text.find("RA")
-                plate_candidate = plate_text[start_idx:]
-                if len(plate_candidate) >= 7:
-                    plate_candidate = plate_candidate[:7]
-                    prefix, digits, suffix = plate_candidate[:3], plate_candidate[3:6], plate_candidate[6]
-                    if (prefix.isalpha() and prefix.isupper() and
-                        digits.isdigit() and suffix.isalpha() and suffix.isupper()):
-                        print(f"[VALID] Plate Detected: {plate_candidate}")
-                        message_queue.add_message(f"Plate Detected: {plate_candidate}", (0, 255, 255))
-                        plate_buffer.append(plate_candidate)
-
-                        if len(plate_buffer) >= 3:
-                            most_common = Counter(plate_buffer).most_common(1)[0][0]
-                            plate_buffer.clear()
-
-                            # Process exit and update CSV
-                            if process_exit(most_common, message_queue):
-                                print(f"[ACCESS GRANTED] Processing exit for {most_common}")
-                                if arduino:
-                                    arduino.write(b'1')  # Open gate
-                                    print("[GATE] Opening gate (sent '1')")
-                                    message_queue.add_message("GATE: Opening", (0, 255, 0))
-                                    time.sleep(15)
-                                    arduino.write(b'0')  # Close gate
-                                    print("[GATE] Closing gate (sent '0')")
-                                    message_queue.add_message("GATE: Closing", (0, 255, 0))
-                            else:
-                                print(f"[ACCESS DENIED] Cannot process exit for {most_common}")
-                                log_unauthorized_exit(most_common, message_queue)
-                                if arduino:
-                                    arduino.write(b'2')  # Trigger warning buzzer
-                                    print("[ALERT] Buzzer triggered (sent '2')")
-                                    message_queue.add_message("ALERT: Unauthorized exit", (0, 0, 255))
-                                    time.sleep(3)  # Buzzer duration
-                                    arduino.write(b'0')  # Stop buzzer
-
-            cv2.imshow("Plate", plate_img)
-            cv2.imshow("Processed", thresh)
-
-    annotated_frame = results[0].plot()
-    # Display all active messages
-    annotated_frame = display_messages(annotated_frame, message_queue)
+            if gray_blur_otsu is not None:
+                thresh = gray_blur_otsu(plate_img)
+            else:
+                gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
+                blur = cv2.GaussianBlur(gray, (5, 5), 0)
+                thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+            plate_imgs.append(plate_img)
+            threshes.append(thresh)
+
+        if not threshes:
+            continue
+
+        # OCR
+        plate_texts = read_plates(threshes)
+
+        for plate_img, thresh, plate_text in zip(plate_imgs, threshes, plate_texts):
+            if args.debug:
+                cv2.imshow("Plate", plate_img)
+                cv2.imshow("Processed", thresh)
+
+            # Too short to hold a plate, or no prefix: OCR noise
+            if len(plate_text) < 7 or "RA" not in plate_text:
+                continue
+
+            start_idx = plate_text.find("RA")
+            match = PLATE_RE.match(plate_text, start_idx)
+            if match:
+                plate_candidate = match.group(0)
+                print(f"[VALID] Plate Detected: {plate_candidate}")
+                message_queue.add_message(f"Plate Detected: {plate_candidate}", (0, 255, 255))
+                plate_votes[plate_candidate] += 1
+                if plate_votes[plate_candidate] > best_count:
+                    best_count, best_plate = plate_votes[plate_candidate], plate_candidate
+
+                if best_count >= 3:
+                    most_common = best_plate
+                    plate_votes.clear()
+                    best_count, best_plate = 0, None
+
+                    # Process exit and update CSV
+                    if process_exit(most_common, message_queue):
+                        print(f"[ACCESS GRANTED] Processing exit for {most_common}")
+                        if arduino:
+                            open_gate(15, message_queue)
+                    else:
+                        print(f"[ACCESS DENIED] Cannot process exit for {most_common}")
+                        log_unauthorized_exit(most_common, message_queue)
+                        if arduino:
+                            sound_buzzer(3, message_queue)  # Buzzer duration
+
+    # Redraw the feed at most display_interval apart; plotting and HighGUI
+    # syncs are wasted work on frames nobody will see
+    now = time.monotonic()
+    if now - last_show >= display_interval:
+        last_show = now
+        annotated_frame = results[-1].plot() if results else frames[-1]
+        # Display all active messages
+        annotated_frame = display_messages(annotated_frame, message_queue)
     
-    # Add system status
-    cv2.putText(
-        annotated_frame,
-        "System: ACTIVE",
-        (10, 30),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        0.7,
-        (0, 255, 0),
-        2,
-    )
-    cv2.imshow("Exit Webcam Feed", annotated_frame)
+        # Add system status
+        cv2.putText(
+            annotated_frame,
+            "System: ACTIVE",
+            (10, 30),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.7,
+            (0, 255, 0),
+            2,
+        )
+        cv2.imshow("Exit Webcam Feed", annotated_frame)
 
     if cv2.waitKey(1) & 0xFF == ord('q'):
         message_queue.add_message("System Shutting Down", (255, 165, 0))
         break
 
+capture_stop.set()
+capture_thread.join()
 cap.release()
+consolidate_timer.cancel()
+consolidate_log()
+journal.close()
+unauth_fh.close()
+ocr_api.End()
 if arduino:
     arduino.close()
 cv2.destroyAllWindows()
\ No newline at end of file
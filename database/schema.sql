@@ -14,4 +14,11 @@ CREATE TABLE IF NOT EXISTS unauthorized_exits (
     plate_number VARCHAR(20) NOT NULL,
     timestamp TIMESTAMP NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-); 
\ No newline at end of file
+); 
+
+-- Create indexes for the dashboard's date-range and recent-activity queries
+CREATE INDEX IF NOT EXISTS idx_vehicle_logs_in_time ON vehicle_logs(in_time);
+CREATE INDEX IF NOT EXISTS idx_unauthorized_exits_timestamp ON unauthorized_exits(timestamp);
+
+-- Partial index for the open-session lookups made on every entry, payment and exit
+CREATE INDEX IF NOT EXISTS idx_vehicle_logs_open_plate ON vehicle_logs(plate_number) WHERE out_time IS NULL;
@@ -26,5 +26,6 @@ CREATE TABLE unauthorized_exits (
 CREATE INDEX idx_vehicle_logs_plate_number ON vehicle_logs(plate_number);
 CREATE INDEX idx_vehicle_logs_in_time ON vehicle_logs(in_time);
 CREATE INDEX idx_vehicle_logs_out_time ON vehicle_logs(out_time);
+CREATE INDEX idx_vehicle_logs_open_plate ON vehicle_logs(plate_number) WHERE out_time IS NULL;
 CREATE INDEX idx_unauthorized_exits_timestamp ON unauthorized_exits(timestamp);
 CREATE INDEX idx_unauthorized_exits_plate_number ON unauthorized_exits(plate_number); 
\ No newline at end of file
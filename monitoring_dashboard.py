@@ -1,13 +1,15 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
-import time
 import os
 import plotly.express as px
 import plotly.graph_objects as go
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 import json
+import io
+import functools
 from urllib.parse import quote_plus
 
 # Set page config
@@ -18,7 +20,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for improved styling
+# Custom CSS for improved styling. Emitted on every run: Streamlit drops elements a
+# rerun doesn't re-emit, and auto-refresh reruns only the real-time fragment anyway
 st.markdown("""
     <style>
     .main {
@@ -38,33 +41,6 @@ st.markdown("""
         background-color: #fff5f5;
         border: 1px solid #f87171;
     }
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 1.5rem;
-        background-color: #f0f2f6;
-        padding: 0.5rem;
-        border-radius: 0.75rem;
-    }
-    .stTabs [data-baseweb="tab"] {
-        height: 3.5rem;
-        white-space: pre-wrap;
-        background-color: #e0e0e0;
-        border-radius: 0.5rem;
-        padding: 1rem;
-        font-weight: 600;
-        color: #2563eb;
-    }
-    .stTabs [aria-selected="true"] {
-        background-color: #2563eb;
-        color: #ffffff;
-        border-radius: 0.5rem;
-    }
-    .card {
-        background-color: #ffffff;
-        padding: 1.5rem;
-        border-radius: 0.75rem;
-        box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-        margin-bottom: 1.5rem;
-    }
     </style>
 """, unsafe_allow_html=True)
 
@@ -77,7 +53,8 @@ def load_db_config():
         st.error(f"Error loading database configuration: {str(e)}")
         return None
 
-# Database connection
+# Database connection: one engine (and connection pool) per server process
+@st.cache_resource
 def get_db_connection():
     config = load_db_config()
     if config is None:
@@ -87,63 +64,329 @@ def get_db_connection():
         # URL encode the password to handle special characters
         password = quote_plus(config['password'])
         connection_string = f"postgresql://{config['user']}:{password}@{config['host']}:{config['port']}/{config['database']}"
-        engine = create_engine(connection_string)
+        # Long-lived: check pooled connections before use so a DB restart doesn't break the page
+        engine = create_engine(connection_string, pool_pre_ping=True)
         return engine
     except Exception as e:
         st.error(f"Error connecting to database: {str(e)}")
         return None
 
-def load_unauthorised():
-    """Load unauthorized exits from PostgreSQL database"""
+@st.cache_data(ttl=10, show_spinner=False)
+def load_unauthorised(start, end):
+    """Load unauthorized exits in [start, end) from PostgreSQL database"""
     try:
         engine = get_db_connection()
         if engine is None:
+            get_db_connection.clear()  # don't keep a failed connection cached
             return None
         
-        query = """
+        query = text("""
         SELECT * FROM unauthorized_exits 
+        WHERE timestamp >= :start AND timestamp < :end
         ORDER BY timestamp DESC
-        """
-        unauthorised = pd.read_sql(query, engine)
-        unauthorised['timestamp'] = pd.to_datetime(unauthorised['timestamp'])
+        """)
+        with engine.connect() as conn:
+            unauthorised = pd.read_sql(
+                query,
+                conn,
+                params={"start": start, "end": end},
+                parse_dates=["timestamp"],
+                dtype={"plate_number": "string[pyarrow]"},
+            )
         return unauthorised
     except Exception as e:
         st.error(f"Error loading unauthorised data: {str(e)}")
         return None
 
-def load_data():
-    """Load data from PostgreSQL database"""
+VEHICLE_COLUMNS = """
+    plate_number as "Plate Number",
+    in_time as "In time",
+    out_time as "Out time",
+    CASE 
+        WHEN out_time IS NOT NULL THEN 'out'
+        ELSE 'in'
+    END as status
+"""
+
+def read_vehicle_logs(query, engine, params=None):
+    """Read VEHICLE_COLUMNS rows into a typed frame with a duration column"""
+    # Time columns are converted while the frame is built; plates are held as
+    # Arrow strings so the plate search runs on Arrow's string kernels
+    # A server-side cursor streams the history in chunks, so the raw rows are
+    # never all held as Python objects at once
+    with engine.connect().execution_options(stream_results=True) as conn:
+        chunks = pd.read_sql(
+            text(query),
+            conn,
+            params=params,
+            parse_dates={"In time": {}, "Out time": {"errors": "coerce"}},
+            dtype={"Plate Number": "string[pyarrow]"},
+            chunksize=50_000,
+        )
+        plates_log = pd.concat(chunks, ignore_index=True)
+    # Vectorized; rows still inside (NaT out time) come out as NaN
+    plates_log["duration"] = (plates_log["Out time"] - plates_log["In time"]).dt.total_seconds() / 3600.0
+    return plates_log
+
+@st.cache_data(ttl=10, show_spinner=False)
+def load_data(start, end):
+    """Load entries made in [start, end) from PostgreSQL database"""
     try:
         engine = get_db_connection()
         if engine is None:
+            get_db_connection.clear()  # don't keep a failed connection cached
             return None
         
-        query = """
-        SELECT 
-            plate_number as "Plate Number",
-            in_time as "In time",
-            out_time as "Out time",
-            CASE 
-                WHEN out_time IS NOT NULL THEN 'out'
-                ELSE 'in'
-            END as status
+        query = f"""
+        SELECT {VEHICLE_COLUMNS}
         FROM vehicle_logs
+        WHERE in_time >= :start AND in_time < :end
         ORDER BY in_time DESC
         """
-        plates_log = pd.read_sql(query, engine)
-        
-        # Convert time columns to datetime
-        plates_log["In time"] = pd.to_datetime(plates_log["In time"])
-        plates_log["Out time"] = pd.to_datetime(plates_log["Out time"], errors='coerce')
-        return plates_log
+        return read_vehicle_logs(query, engine, {"start": start, "end": end})
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         return None
 
-def calculate_duration(row):
-    if pd.notna(row["Out time"]):
-        return (row["Out time"] - row["In time"]).total_seconds() / 3600
-    return None
+@st.cache_data(ttl=10, show_spinner=False)
+def load_recent_activity(limit=10):
+    """Load only the newest entries for the Recent Activity panel"""
+    try:
+        engine = get_db_connection()
+        if engine is None:
+            get_db_connection.clear()
+            return None
+
+        query = f"""
+        SELECT {VEHICLE_COLUMNS}
+        FROM vehicle_logs
+        ORDER BY in_time DESC
+        LIMIT :limit
+        """
+        return read_vehicle_logs(query, engine, {"limit": limit})
+    except Exception as e:
+        st.error(f"Error loading recent activity: {str(e)}")
+        return None
+
+@st.cache_data(ttl=10, show_spinner=False)
+def load_metrics(start):
+    """Headline counts computed by Postgres instead of over every row in pandas"""
+    try:
+        engine = get_db_connection()
+        if engine is None:
+            get_db_connection.clear()
+            return None
+
+        query = text("""
+        SELECT
+            COUNT(*) AS total,
+            COUNT(*) FILTER (WHERE out_time IS NULL) AS current,
+            COUNT(*) FILTER (WHERE in_time >= :start) AS since_start,
+            AVG(EXTRACT(EPOCH FROM (out_time - in_time)) / 3600) AS avg_duration
+        FROM vehicle_logs
+        """)
+        with engine.connect() as conn:
+            return dict(conn.execute(query, {"start": start}).mappings().one())
+    except Exception as e:
+        st.error(f"Error loading metrics: {str(e)}")
+        return None
+
+@st.cache_data(ttl=10, show_spinner=False)
+def load_hourly_counts(start, end):
+    """Entries per hour of day in [start, end), grouped in SQL"""
+    try:
+        engine = get_db_connection()
+        if engine is None:
+            get_db_connection.clear()
+            return None
+
+        query = text("""
+        SELECT EXTRACT(HOUR FROM in_time)::int AS hour, COUNT(*) AS count
+        FROM vehicle_logs
+        WHERE in_time >= :start AND in_time < :end
+        GROUP BY 1
+        ORDER BY 1
+        """)
+        with engine.connect() as conn:
+            counts = pd.read_sql(query, conn, params={"start": start, "end": end})
+        # Scatter into all 24 bins so quiet hours show as zero
+        hourly = np.zeros(24, dtype=np.int64)
+        hourly[counts["hour"].to_numpy()] = counts["count"].to_numpy()
+        return pd.DataFrame({"hour": np.arange(24), "count": hourly})
+    except Exception as e:
+        st.error(f"Error loading hourly counts: {str(e)}")
+        return None
+
+@st.cache_data(ttl=10, show_spinner=False)
+def load_daily_unauthorised(start, end):
+    """Unauthorized exits per day in [start, end), grouped in SQL"""
+    try:
+        engine = get_db_connection()
+        if engine is None:
+            get_db_connection.clear()
+            return None
+
+        query = text("""
+        SELECT timestamp::date AS timestamp, COUNT(*) AS count
+        FROM unauthorized_exits
+        WHERE timestamp >= :start AND timestamp < :end
+        GROUP BY 1
+        ORDER BY 1
+        """)
+        with engine.connect() as conn:
+            return pd.read_sql(query, conn, params={"start": start, "end": end})
+    except Exception as e:
+        st.error(f"Error loading unauthorised counts: {str(e)}")
+        return None
+
+# Formatting is done by the dataframe widget in the browser, not per cell in Python
+VEHICLE_COLUMN_CONFIG = {
+    "In time": st.column_config.DatetimeColumn("In time", format="YYYY-MM-DD HH:mm:ss"),
+    "Out time": st.column_config.DatetimeColumn("Out time", format="YYYY-MM-DD HH:mm:ss"),
+    "duration": st.column_config.NumberColumn("duration", format="%.2f hrs"),
+    "status": st.column_config.TextColumn("status"),
+}
+STATUS_LABELS = {"in": "🟢 in", "out": "🔴 out"}
+
+def show_vehicle_table(vehicle_logs):
+    """Display vehicle log rows with the shared column formats"""
+    st.dataframe(
+        vehicle_logs.assign(status=vehicle_logs["status"].map(STATUS_LABELS)),
+        column_config=VEHICLE_COLUMN_CONFIG,
+        hide_index=True,
+        use_container_width=True,
+        height=350,
+    )
+
+def to_csv_bytes(df, compress=False):
+    """Serialize a frame for st.download_button, gzip-compressed if requested
+
+    Passed to the button as a callable so the bytes are only built on click.
+    """
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False, compression="gzip" if compress else None)
+    return buffer.getvalue()
+
+# Figures are rebuilt only when their input data changes between refreshes. The
+# loaders refresh every 10 s, so keep only the last few figures per builder
+@st.cache_data(show_spinner=False, max_entries=4)
+def build_unauthorised_fig(daily_counts):
+    fig = px.bar(
+        daily_counts,
+        x='timestamp',
+        y='count',
+        title='Unauthorized Exits Over Time',
+        labels={'timestamp': 'Date', 'count': 'Number of Unauthorized Exits'},
+        color_discrete_sequence=['#dc2626']
+    )
+    fig.update_layout(
+        showlegend=False,
+        hovermode='x unified',
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        xaxis=dict(
+            gridcolor='#e5e7eb',
+            showgrid=True
+        ),
+        yaxis=dict(
+            gridcolor='#e5e7eb',
+            showgrid=True
+        )
+    )
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def build_hourly_fig(hourly_data):
+    fig = px.line(
+        hourly_data,
+        x='hour',
+        y='count',
+        title='Vehicle Occupancy by Hour',
+        labels={'hour': 'Hour of Day', 'count': 'Number of Vehicles'},
+        color_discrete_sequence=['#2563eb']
+    )
+    fig.update_layout(
+        showlegend=False,
+        hovermode='x unified',
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        xaxis=dict(
+            gridcolor='#e5e7eb',
+            showgrid=True,
+            tickmode='linear',
+            tick0=0,
+            dtick=1
+        ),
+        yaxis=dict(
+            gridcolor='#e5e7eb',
+            showgrid=True
+        )
+    )
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def build_duration_fig(durations):
+    fig = px.histogram(
+        durations,
+        x='duration',
+        title='Parking Duration Distribution',
+        labels={'duration': 'Duration (hours)', 'count': 'Count'},
+        color_discrete_sequence=['#059669']
+    )
+    fig.update_layout(
+        showlegend=False,
+        hovermode='x unified',
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        xaxis=dict(
+            gridcolor='#e5e7eb',
+            showgrid=True
+        ),
+        yaxis=dict(
+            gridcolor='#e5e7eb',
+            showgrid=True
+        )
+    )
+    return fig
+
+def realtime_panel(start, end):
+    """Metrics and recent activity; run as a fragment so auto-refresh only redraws this view"""
+    st.header("Real-time Vehicle Monitoring")
+    with st.container(border=True):
+        col1, col2, col3, col4 = st.columns(4)
+
+        # Load data with spinner
+        with st.spinner("Loading data..."):
+            unauthorised = load_unauthorised(start, end)
+            metrics = load_metrics(start)
+            recent_activity = load_recent_activity()
+
+            if metrics is not None:
+                total_vehicles = metrics["total"]
+                current_vehicles = metrics["current"]
+                unauthorized_exits = len(unauthorised) if unauthorised is not None else 0
+                avg_duration = float(metrics["avg_duration"]) if metrics["avg_duration"] is not None else float("nan")
+
+                with col1:
+                    st.metric("Total Vehicles", total_vehicles, delta=f"{metrics['since_start']}", delta_color="normal")
+                with col2:
+                    st.metric("Current Vehicles", current_vehicles, delta_color="off")
+                with col3:
+                    st.metric("Unauthorized Exits", unauthorized_exits, delta_color="normal")
+                with col4:
+                    st.metric("Avg. Duration (hrs)", f"{avg_duration:.2f}", delta_color="off")
+
+        # Recent activity
+        st.subheader("Recent Activity")
+        with st.container(border=True):
+            if recent_activity is not None:
+                show_vehicle_table(recent_activity)
+                st.download_button(
+                    "Export Recent Activity to CSV",
+                    functools.partial(to_csv_bytes, recent_activity),
+                    "recent_activity_export.csv",
+                    "text/csv",
+                )
 
 def main():
     st.title("Parking System Monitor")
@@ -160,101 +403,38 @@ def main():
             )
             auto_refresh = st.checkbox("Auto-Refresh (every 10s)", value=True)
         st.markdown("---")
+        # Only the selected view is computed; st.tabs would run all four every time
+        view = st.radio(
+            "View",
+            ["Real-time Monitoring", "Unauthorized Exits", "Vehicle History", "Analytics"],
+        )
+        st.markdown("---")
         st.caption("Last updated: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
-    # Create tabs
-    tab1, tab2, tab3, tab4 = st.tabs(
-        ["Real-time Monitoring", "Unauthorized Exits", "Vehicle History", "Analytics"]
-    )
+    # Selected days as a half-open range; the picker returns one date mid-selection
+    start = pd.Timestamp(date_range[0])
+    end = pd.Timestamp(date_range[-1]) + pd.Timedelta(days=1)
 
-    with tab1:
-        st.header("Real-time Vehicle Monitoring")
-        with st.container():
-            st.markdown('<div class="card">', unsafe_allow_html=True)
-            col1, col2, col3, col4 = st.columns(4)
-
-            # Load data with spinner
-            with st.spinner("Loading data..."):
-                plates_log = load_data()
-                unauthorised = load_unauthorised()
-
-                if plates_log is not None:
-                    # Calculate metrics
-                    total_vehicles = len(plates_log)
-                    current_vehicles = len(plates_log[plates_log["status"] == "in"])
-                    unauthorized_exits = len(unauthorised) if unauthorised is not None else 0
-                    plates_log["duration"] = plates_log.apply(calculate_duration, axis=1)
-                    avg_duration = plates_log["duration"].mean()
+    if view == "Real-time Monitoring":
+        st.fragment(realtime_panel, run_every=10 if auto_refresh else None)(start, end)
 
-                    with col1:
-                        delta = total_vehicles - len(plates_log[plates_log['In time'] < pd.Timestamp(date_range[0])])
-                        st.metric("Total Vehicles", total_vehicles, delta=f"{delta}", delta_color="normal")
-                    with col2:
-                        st.metric("Current Vehicles", current_vehicles, delta_color="off")
-                    with col3:
-                        st.metric("Unauthorized Exits", unauthorized_exits, delta_color="normal")
-                    with col4:
-                        st.metric("Avg. Duration (hrs)", f"{avg_duration:.2f}", delta_color="off")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-            # Recent activity
-            st.subheader("Recent Activity")
-            with st.container():
-                st.markdown('<div class="card">', unsafe_allow_html=True)
-                if plates_log is not None:
-                    recent_activity = plates_log.sort_values(by="In time", ascending=False).head(10)
-                    styled_df = recent_activity.style.format({
-                        "In time": lambda x: x.strftime("%Y-%m-%d %H:%M:%S"),
-                        "Out time": lambda x: x.strftime("%Y-%m-%d %H:%M:%S") if pd.notna(x) else "N/A"
-                    }).applymap(
-                        lambda x: 'background-color: #dcfce7; color: #166534;' if x == "in" 
-                        else 'background-color: #fee2e2; color: #991b1b;', 
-                        subset=["status"]
-                    )
-                    st.dataframe(styled_df, use_container_width=True, height=350)
-                    if st.button("Export Recent Activity to CSV"):
-                        recent_activity.to_csv("recent_activity_export.csv", index=False)
-                        st.success("Exported successfully!")
-                st.markdown('</div>', unsafe_allow_html=True)
-
-    with tab2:
+    elif view == "Unauthorized Exits":
         st.header("Unauthorized Exit Attempts")
-        with st.container():
-            st.markdown('<div class="card">', unsafe_allow_html=True)
+        unauthorised = load_unauthorised(start, end)
+        with st.container(border=True):
             if unauthorised is not None and not unauthorised.empty:
                 st.dataframe(unauthorised, use_container_width=True, height=350)
-                daily_counts = unauthorised.groupby(unauthorised['timestamp'].dt.date).size().reset_index(name='count')
-                fig = px.bar(
-                    daily_counts,
-                    x='timestamp',
-                    y='count',
-                    title='Unauthorized Exits Over Time',
-                    labels={'timestamp': 'Date', 'count': 'Number of Unauthorized Exits'},
-                    color_discrete_sequence=['#dc2626']
-                )
-                fig.update_layout(
-                    showlegend=False,
-                    hovermode='x unified',
-                    plot_bgcolor='white',
-                    paper_bgcolor='white',
-                    xaxis=dict(
-                        gridcolor='#e5e7eb',
-                        showgrid=True
-                    ),
-                    yaxis=dict(
-                        gridcolor='#e5e7eb',
-                        showgrid=True
-                    )
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                daily_counts = load_daily_unauthorised(start, end)
+                if daily_counts is not None:
+                    fig = build_unauthorised_fig(daily_counts)
+                    st.plotly_chart(fig, use_container_width=True)
             else:
                 st.markdown('<div class="stAlert">No unauthorized exit attempts recorded. ✅</div>', unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
 
-    with tab3:
+    elif view == "Vehicle History":
         st.header("Vehicle History")
-        with st.container():
-            st.markdown('<div class="card">', unsafe_allow_html=True)
+        plates_log = load_data(start, end)
+        with st.container(border=True):
             if plates_log is not None:
                 # Filters
                 with st.expander("Filter Settings", expanded=True):
@@ -271,95 +451,45 @@ def main():
                 # Apply filters
                 filtered_data = plates_log
                 if plate_filter:
-                    filtered_data = filtered_data[filtered_data["Plate Number"].str.contains(plate_filter, case=False, na=False)]
+                    # Plain substring match; plates never need regex
+                    filtered_data = filtered_data[filtered_data["Plate Number"].str.contains(plate_filter, case=False, na=False, regex=False)]
                 if status_filter != "All":
                     filtered_data = filtered_data[filtered_data["status"] == status_filter]
                 if duration_filter > 0:
                     filtered_data = filtered_data[filtered_data["duration"] >= duration_filter]
 
-                styled_df = filtered_data.style.format({
-                    "In time": lambda x: x.strftime("%Y-%m-%d %H:%M:%S"),
-                    "Out time": lambda x: x.strftime("%Y-%m-%d %H:%M:%S") if pd.notna(x) else "N/A",
-                    "duration": lambda x: f"{x:.2f} hrs" if pd.notna(x) else "N/A"
-                }).applymap(
-                    lambda x: 'background-color: #dcfce7; color: #166534;' if x == "in" 
-                    else 'background-color: #fee2e2; color: #991b1b;', 
-                    subset=["status"]
+                show_vehicle_table(filtered_data)
+                st.download_button(
+                    "Export History to CSV",
+                    functools.partial(to_csv_bytes, filtered_data, compress=True),
+                    "vehicle_history_export.csv.gz",
+                    "application/gzip",
                 )
-                st.dataframe(styled_df, use_container_width=True, height=350)
-                if st.button("Export History to CSV"):
-                    filtered_data.to_csv("vehicle_history_export.csv", index=False)
-                    st.success("Exported successfully!")
-            st.markdown('</div>', unsafe_allow_html=True)
 
-    with tab4:
+    elif view == "Analytics":
         st.header("Analytics Dashboard")
-        with st.container():
-            st.markdown('<div class="card">', unsafe_allow_html=True)
+        plates_log = load_data(start, end)
+        metrics = load_metrics(start)
+        with st.container(border=True):
             if plates_log is not None:
                 col1, col2 = st.columns(2)
                 with col1:
-                    # Create hourly data DataFrame
-                    hourly_data = plates_log.groupby(plates_log['In time'].dt.hour).size().reset_index(name='count')
-                    hourly_data.columns = ['hour', 'count']
+                    hourly_data = load_hourly_counts(start, end)
                     
-                    # Create line plot
-                    fig1 = px.line(
-                        hourly_data,
-                        x='hour',
-                        y='count',
-                        title='Vehicle Occupancy by Hour',
-                        labels={'hour': 'Hour of Day', 'count': 'Number of Vehicles'},
-                        color_discrete_sequence=['#2563eb']
-                    )
-                    fig1.update_layout(
-                        showlegend=False,
-                        hovermode='x unified',
-                        plot_bgcolor='white',
-                        paper_bgcolor='white',
-                        xaxis=dict(
-                            gridcolor='#e5e7eb',
-                            showgrid=True,
-                            tickmode='linear',
-                            tick0=0,
-                            dtick=1
-                        ),
-                        yaxis=dict(
-                            gridcolor='#e5e7eb',
-                            showgrid=True
-                        )
-                    )
-                    st.plotly_chart(fig1, use_container_width=True)
+                    # None means the query failed; load_hourly_counts already showed the error
+                    if hourly_data is not None:
+                        fig1 = build_hourly_fig(hourly_data)
+                        st.plotly_chart(fig1, use_container_width=True)
 
                 with col2:
-                    fig2 = px.histogram(
-                        plates_log,
-                        x='duration',
-                        title='Parking Duration Distribution',
-                        labels={'duration': 'Duration (hours)', 'count': 'Count'},
-                        color_discrete_sequence=['#059669']
-                    )
-                    fig2.update_layout(
-                        showlegend=False,
-                        hovermode='x unified',
-                        plot_bgcolor='white',
-                        paper_bgcolor='white',
-                        xaxis=dict(
-                            gridcolor='#e5e7eb',
-                            showgrid=True
-                        ),
-                        yaxis=dict(
-                            gridcolor='#e5e7eb',
-                            showgrid=True
-                        )
-                    )
+                    fig2 = build_duration_fig(plates_log[["duration"]])
                     st.plotly_chart(fig2, use_container_width=True)
 
                 st.subheader("Key Performance Indicators")
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    if not hourly_data.empty:
+                    if hourly_data is not None and hourly_data['count'].any():
                         peak_hour = hourly_data.loc[hourly_data['count'].idxmax(), 'hour']
                         st.metric("Peak Hour", f"{peak_hour:02d}:00")
                     else:
@@ -367,23 +497,17 @@ def main():
                 
                 with col2:
                     if not plates_log.empty:
-                        avg_daily_vehicles = len(plates_log) / max((date_range[1] - date_range[0]).days, 1)
+                        avg_daily_vehicles = len(plates_log) / max((end - start).days - 1, 1)
                         st.metric("Avg. Daily Vehicles", f"{avg_daily_vehicles:.1f}")
                     else:
                         st.metric("Avg. Daily Vehicles", "No data")
                 
                 with col3:
-                    if not plates_log.empty and total_vehicles > 0:
-                        occupancy_rate = (current_vehicles / total_vehicles) * 100
+                    if metrics is not None and metrics["total"] > 0:
+                        occupancy_rate = (metrics["current"] / metrics["total"]) * 100
                         st.metric("Current Occupancy Rate", f"{occupancy_rate:.1f}%")
                     else:
                         st.metric("Current Occupancy Rate", "No data")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-    # Auto-refresh logic
-    if auto_refresh:
-        time.sleep(10)
-        st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
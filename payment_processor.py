@@ -2,33 +2,100 @@ from rfid_manager import RFIDManager
 import time
 from datetime import datetime
 import csv
+import io
 import os
+import re
+import argparse
+import warnings
+import numpy as np
 from sqlalchemy import text
-from utils.data_handler import get_db_connection
+from utils.data_handler import get_shared_engine
+from utils.plates_log import locked_plates_log, is_replaced
+
+# Balances are written zero-padded so a card's row keeps its byte length and
+# can be patched in place instead of rewriting cards.csv
+BALANCE_FORMAT = "{:012.2f}"
+
+MARK_PAID_QUERY = text("""
+    UPDATE vehicle_logs 
+    SET status = 1
+    WHERE plate_number = :plate_number 
+    AND status = 0
+    AND out_time IS NULL
+""")
+
+# Column positions in cards.csv
+CARD_ID, PLATE, BALANCE = 0, 1, 2
+
+# A complete plates_log.csv row whose Out time is empty; rows still being
+# appended (no newline yet) and the header never match
+OPEN_SESSION_RE = re.compile(rb"^([^,\r\n]*),([^,\r\n]*),([^,\r\n]*),\r?\n", re.M)
+
+
+def _is_number(value):
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
 
 
 class PaymentProcessor:
-    def __init__(self):
-        self.rfid = RFIDManager()
-        self.cards_csv = "./database/cards.csv"
-        self.plates_csv = "./database/plates_log.csv"  # From car_entry.py
+    cards_csv = "./database/cards.csv"
+    plates_csv = "./database/plates_log.csv"  # From car_entry.py
+
+    def __init__(self, debug=False):
+        """Assumes bootstrap() has created the data files"""
+        self.rfid = RFIDManager(debug)
         self.parking_rate = 200  # 200 per hour
         self.minimum_charge = 500  # Minimum charge for under 1 hour
-        self.initialize_cards_csv()
+        # cards.csv parsed into {card_id: row tuple} plus {card_id: (byte offset, row length)};
+        # rebuilt when the file's stat stamp changes
+        self._cards_index = {}
+        self._card_offsets = {}
+        self._cards_stamp = None
+        self._cards_fp = None
+        # Latest row without an Out time per plate in plates_log.csv:
+        # {plate: (byte offset, in_time, payment_status)}
+        self._open_sessions = {}
+        self._plates_stamp = None
+        self._plates_fp = None  # opened on first use; car_entry.py creates the file
+        self._load_cards_cache()
+        self._pad_legacy_balances()
+        self._load_open_sessions()
 
-    def initialize_cards_csv(self):
-        """Initialize cards.csv if it doesn't exist"""
-        if not os.path.exists(self.cards_csv):
-            with open(self.cards_csv, "w", newline="") as f:
+    @classmethod
+    def bootstrap(cls):
+        """Create the database directory and cards.csv once at program start"""
+        os.makedirs(os.path.dirname(cls.cards_csv), exist_ok=True)
+        if not os.path.exists(cls.cards_csv):
+            with open(cls.cards_csv, "w", newline="") as f:
                 writer = csv.writer(f)
                 writer.writerow(["Card ID", "Plate Number", "Balance"])
 
-    def register_card(self):
-        """Register a new card"""
+    def _pad_legacy_balances(self):
+        """Pad balances written before BALANCE_FORMAT so every row is patchable in place"""
+        padded = {
+            card_id: (card_id, plate_number, BALANCE_FORMAT.format(float(balance)))
+            for card_id, plate_number, balance in self._cards_index.values()
+        }
+        if padded != self._cards_index:
+            self._cards_index = padded
+            self._rewrite_cards_csv()
+            self._cards_stamp = self._stat_stamp(self.cards_csv)
+
+    def wait_for_card(self):
+        """Prompt for a card tap; returns the card ID or None on timeout"""
         print("\nWaiting for card...")
         card_id = self.rfid.wait_for_card(10)
         if not card_id:
             print("No card detected within time limit")
+        return card_id
+
+    def register_card(self):
+        """Register a new card"""
+        card_id = self.wait_for_card()
+        if not card_id:
             return
 
         # Check if card is already registered
@@ -47,19 +114,19 @@ class PaymentProcessor:
 
         if self.rfid.write_rfid(card_id, plate_number, balance):
             self.log_transaction(card_id, plate_number, balance)
-            print("\nCard registered successfully!")
-            print(f"Card ID: {card_id}")
-            print(f"Plate: {plate_number}")
-            print(f"Initial Balance: {balance}")
+            print(
+                "\nCard registered successfully!\n"
+                f"Card ID: {card_id}\n"
+                f"Plate: {plate_number}\n"
+                f"Initial Balance: {balance}"
+            )
         else:
             print("Failed to register card")
 
     def topup_balance(self):
         """Top up card balance"""
-        print("\nWaiting for card...")
-        card_id = self.rfid.wait_for_card(10)
+        card_id = self.wait_for_card()
         if not card_id:
-            print("No card detected within time limit")
             return
 
         card_data = self.get_card_data(card_id)
@@ -68,7 +135,7 @@ class PaymentProcessor:
             return
 
         print(f"\nCard ID: {card_id}")
-        print(f"Current Balance: {card_data['Balance']}")
+        print(f"Current Balance: {float(card_data['Balance']):.2f}")
         try:
             amount = float(input("Enter top-up amount: "))
             if amount <= 0:
@@ -86,27 +153,25 @@ class PaymentProcessor:
 
     def check_card(self):
         """Check card details"""
-        print("\nWaiting for card...")
-        card_id = self.rfid.wait_for_card(10)
+        card_id = self.wait_for_card()
         if not card_id:
-            print("No card detected within time limit")
             return
 
         card_data = self.get_card_data(card_id)
         if card_data:
-            print("\nCard Details:")
-            print(f"Card ID: {card_id}")
-            print(f"Plate: {card_data['Plate Number']}")
-            print(f"Balance: {card_data['Balance']}")
+            print(
+                "\nCard Details:\n"
+                f"Card ID: {card_id}\n"
+                f"Plate: {card_data['Plate Number']}\n"
+                f"Balance: {float(card_data['Balance']):.2f}"
+            )
         else:
             print("Card not registered")
 
     def process_exit(self):
         """Process parking exit and payment (without updating Out time)"""
-        print("\nWaiting for card...")
-        card_id = self.rfid.wait_for_card(10)
+        card_id = self.wait_for_card()
         if not card_id:
-            print("No card detected within time limit")
             return
 
         card_data = self.get_card_data(card_id)
@@ -115,103 +180,60 @@ class PaymentProcessor:
             return
 
         plate_number = card_data["Plate Number"]
-        balance = float(card_data["Balance"])
+        balance_cents = round(float(card_data["Balance"]) * 100)
 
         # Find the latest entry in plates_log.csv with no Out time
-        entry = None
         try:
-            with open(self.plates_csv, "r") as f:
-                reader = csv.DictReader(f)
-                for row in reversed(list(reader)):
-                    if row["Plate Number"] == plate_number and not row["Out time"]:
-                        # Check if payment status is already 1
-                        if row["Payment Status"] == "1":
-                            print("This vehicle has already paid for parking!")
-                            return
-                        entry = row
-                        break
+            self._load_open_sessions()
         except Exception as e:
             print(f"[CSV READ ERROR] {str(e)}")
             return
 
+        entry = self._open_sessions.get(plate_number)
         if not entry:
             print("No active parking session for this plate")
             return
+        _, in_time, payment_status = entry
+        # Check if payment status is already 1
+        if payment_status == "1":
+            print("This vehicle has already paid for parking!")
+            return
+
+        # Calculate fee in whole cents so no float rounding creeps into balances
+        # fromisoformat is the C fast path for the "%Y-%m-%d %H:%M:%S" rows car_entry.py writes
+        duration_seconds = int(time.time()) - int(datetime.fromisoformat(in_time).timestamp())
 
-        # Calculate fee
-        current_time = datetime.now()
-        entry_time = datetime.strptime(entry["In time"], "%Y-%m-%d %H:%M:%S")
-        duration_hours = (current_time - entry_time).total_seconds() / 3600
-        
         # Apply minimum charge for durations under 1 hour
-        if duration_hours < 1:
-            fee = self.minimum_charge
+        if duration_seconds < 3600:
+            fee_cents = self.minimum_charge * 100
         else:
-            fee = duration_hours * self.parking_rate
-        fee = round(fee, 2)
+            # parking_rate per hour, rounded half-up to the cent
+            fee_cents = (duration_seconds * self.parking_rate * 100 + 1800) // 3600
+        fee = fee_cents / 100
 
-        if balance >= fee:
-            new_balance = round(balance - fee, 2)
+        if balance_cents >= fee_cents:
+            new_balance = (balance_cents - fee_cents) / 100
             if self.rfid.write_rfid(card_id, plate_number, new_balance):
                 # Update cards.csv with new balance
                 self.log_transaction(card_id, plate_number, new_balance)
 
                 # Update plates_log.csv with Payment Status=1
                 try:
-                    rows = []
-                    with open(self.plates_csv, "r") as f:
-                        reader = csv.DictReader(f)
-                        rows = list(reader)
-                    
-                    updated = False
-                    for row in rows:
-                        if (row["Plate Number"] == plate_number and 
-                            row["In time"] == entry["In time"] and 
-                            row["Payment Status"] == "0"):
-                            row["Payment Status"] = "1"
-                            updated = True
-                            break
-                    
-                    if not updated:
+                    if not self._mark_paid(plate_number, in_time):
                         print("Error: Could not find matching entry to update")
                         return
 
-                    with open(self.plates_csv, "w", newline="") as f:
-                        writer = csv.DictWriter(
-                            f,
-                            fieldnames=[
-                                "Plate Number",
-                                "Payment Status",
-                                "In time",
-                                "Out time",
-                            ],
-                        )
-                        writer.writeheader()
-                        writer.writerows(rows)
-
                     # Update database
-                    engine = get_db_connection()
+                    engine = get_shared_engine()
                     if engine is not None:
-                        query = text(
-                            """
-                            UPDATE vehicle_logs 
-                            SET status = 1
-                            WHERE plate_number = :plate_number 
-                            AND status = 0
-                        """
-                        )
-                        with engine.connect() as conn:
+                        with engine.begin() as conn:
                             result = conn.execute(
-                                query,
-                                {
-                                    "plate_number": plate_number,
-                                },
+                                MARK_PAID_QUERY, {"plate_number": plate_number}
                             )
-                            conn.commit()
-                            if result.rowcount > 0:
-                                print("[DATABASE] Payment status updated in database")
-                            else:
-                                print("[ERROR] No matching record found in database")
+                        if result.rowcount > 0:
+                            print("[DATABASE] Payment status updated in database")
+                        else:
+                            print("[ERROR] No matching record found in database")
                     else:
                         print("[ERROR] Failed to connect to database")
 
@@ -219,23 +241,134 @@ class PaymentProcessor:
                     print(f"[CSV WRITE ERROR] {str(e)}")
                     return
 
-                print("\nPayment successful!")
-                print(f"Duration: {(current_time - entry_time).total_seconds() / 60:.1f} min")
-                print(f"Fee: {fee:.2f}")
-                print(f"New Balance: {new_balance:.2f}")
+                print(
+                    "\nPayment successful!\n"
+                    f"Duration: {duration_seconds / 60:.1f} min\n"
+                    f"Fee: {fee:.2f}\n"
+                    f"New Balance: {new_balance:.2f}"
+                )
             else:
                 print("Failed to update card balance")
         else:
-            print(f"Insufficient balance (Need: {fee:.2f}, Has: {balance:.2f})")
+            print(f"Insufficient balance (Need: {fee:.2f}, Has: {balance_cents / 100:.2f})")
+
+    def _stat_stamp(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_cards_cache(self):
+        """Re-parse cards.csv only if it changed since the last read"""
+        stamp = self._stat_stamp(self.cards_csv)
+        if stamp == self._cards_stamp:
+            return
+        index, offsets = {}, {}
+        if self._cards_fp is not None:
+            # Changed behind our back (e.g. edited by hand): reopen in case it was replaced
+            self._cards_fp.close()
+            self._cards_fp = None
+        if stamp is not None:
+            self._cards_fp = open(self.cards_csv, "r+b", buffering=0)
+            lines = self._cards_fp.readall().splitlines(keepends=True)
+            offset = len(lines[0]) if lines else 0  # header
+            for line in lines[1:]:
+                fields = next(csv.reader([line.decode()]), [])
+                if len(fields) < 3 or not _is_number(fields[BALANCE]):
+                    # Blank, truncated or garbled line, e.g. left behind by a hand edit
+                    if line.strip():
+                        print(f"[WARNING] Skipping malformed cards.csv row: {line.decode().strip()}")
+                else:
+                    row = tuple(fields[:3])
+                    index[row[CARD_ID]] = row
+                    offsets[row[CARD_ID]] = (offset, len(line))
+                offset += len(line)
+        self._cards_index = index
+        self._card_offsets = offsets
+        self._cards_stamp = stamp
+
+    def _card_row(self, card_id):
+        # Quoted like csv.writer so fields read back through csv.reader round-trip
+        buf = io.StringIO()
+        csv.writer(buf).writerow(self._cards_index[card_id])
+        return buf.getvalue().encode()
+
+    def _rewrite_cards_csv(self):
+        """Write every cached card back out, recording the new row offsets"""
+        offsets = {}
+        chunks = [b"Card ID,Plate Number,Balance\r\n"]
+        offset = len(chunks[0])
+        for card_id in self._cards_index:
+            row = self._card_row(card_id)
+            offsets[card_id] = (offset, len(row))
+            offset += len(row)
+            chunks.append(row)
+        fd = self._cards_fp.fileno()
+        os.pwrite(fd, b"".join(chunks), 0)
+        os.ftruncate(fd, offset)
+        self._card_offsets = offsets
+
+    def _open_plates_log(self):
+        """Single handle on plates_log.csv reused for every scan and patch"""
+        # Unbuffered so a rescan never serves bytes cached before another process wrote
+        if self._plates_fp is not None and is_replaced(self._plates_fp, self.plates_csv):
+            # car_exit.py swapped in a rewritten log; saved offsets belong to the old one
+            self._plates_fp.close()
+            self._plates_fp = None
+            self._plates_stamp = None
+        if self._plates_fp is None:
+            self._plates_fp = open(self.plates_csv, "r+b", buffering=0)
+        return self._plates_fp
+
+    def _load_open_sessions(self):
+        """Rebuild the open-session index only if plates_log.csv changed on disk"""
+        stamp = self._stat_stamp(self.plates_csv)
+        if stamp == self._plates_stamp:
+            return
+        sessions = {}
+        if stamp is not None:
+            fp = self._open_plates_log()
+            fp.seek(0)
+            # Only rows with an empty Out time matter; let the regex engine skip the rest
+            for match in OPEN_SESSION_RE.finditer(fp.readall()):
+                plate_number, payment_status, in_time = match.groups()
+                sessions[plate_number.decode()] = (
+                    match.start(), in_time.decode(), payment_status.decode()
+                )
+        self._open_sessions = sessions
+        self._plates_stamp = stamp
+
+    def _mark_paid(self, plate_number, in_time):
+        """Flip the session's Payment Status byte from 0 to 1 in place"""
+        # Hold the writer lock so car_exit.py cannot swap the file between the rescan
+        # and the patch
+        with locked_plates_log():
+            # The entry and exit systems may have rewritten the file while the card was written
+            fd = self._open_plates_log().fileno()
+            self._load_open_sessions()
+            entry = self._open_sessions.get(plate_number)
+            if entry is None or entry[1] != in_time or entry[2] != "0":
+                return False
+            status_offset = entry[0] + len(plate_number.encode()) + 1
+            if os.pread(fd, 1, status_offset) != b"0":
+                return False
+            os.pwrite(fd, b"1", status_offset)
+            self._open_sessions[plate_number] = (entry[0], in_time, "1")
+            self._plates_stamp = self._stat_stamp(self.plates_csv)
+        return True
 
     def get_card_data(self, card_id):
         """Retrieve card data from cards.csv"""
         try:
-            with open(self.cards_csv, "r") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if row["Card ID"] == card_id:
-                        return row
+            self._load_cards_cache()
+            row = self._cards_index.get(card_id)
+            if row is not None:
+                return {
+                    "Card ID": row[CARD_ID],
+                    "Plate Number": row[PLATE],
+                    "Balance": row[BALANCE],
+                }
         except Exception as e:
             print(f"[CSV READ ERROR] {str(e)}")
         return None
@@ -243,45 +376,87 @@ class PaymentProcessor:
     def log_transaction(self, card_id, plate_number, balance):
         """Update or add card data in cards.csv"""
         try:
-            rows = []
-            updated = False
-            if os.path.exists(self.cards_csv):
-                with open(self.cards_csv, "r") as f:
-                    reader = csv.DictReader(f)
-                    rows = list(reader)
-                    for row in rows:
-                        if row["Card ID"] == card_id:
-                            row["Plate Number"] = plate_number
-                            row["Balance"] = str(balance)
-                            updated = True
-                            break
-            if not updated:
-                rows.append(
-                    {
-                        "Card ID": card_id,
-                        "Plate Number": plate_number,
-                        "Balance": str(balance),
-                    }
-                )
-            with open(self.cards_csv, "w", newline="") as f:
-                writer = csv.DictWriter(
-                    f, fieldnames=["Card ID", "Plate Number", "Balance"]
-                )
-                writer.writeheader()
-                writer.writerows(rows)
+            self._load_cards_cache()
+            self._cards_index[card_id] = (
+                card_id, plate_number, BALANCE_FORMAT.format(balance)
+            )
+            row = self._card_row(card_id)
+            slot = self._card_offsets.get(card_id)
+            fd = self._cards_fp.fileno()
+            if slot is None:
+                # New card: append a single row
+                offset = self._cards_stamp[1]
+                if offset and os.pread(fd, 1, offset - 1) != b"\n":
+                    # Saved without a trailing newline (e.g. by an editor); end that line first
+                    os.pwrite(fd, b"\r\n", offset)
+                    offset += 2
+                os.pwrite(fd, row, offset)
+                self._card_offsets[card_id] = (offset, len(row))
+            elif slot[1] == len(row):
+                # Same width as before: overwrite the row where it is
+                os.pwrite(fd, row, slot[0])
+            else:
+                # Row width changed (new plate length or balance past BALANCE_FORMAT width)
+                self._rewrite_cards_csv()
+            self._cards_stamp = self._stat_stamp(self.cards_csv)
             return True
         except Exception as e:
             print(f"[CSV WRITE ERROR] {str(e)}")
             return False
 
+    def daily_report(self):
+        """Summarise card balances and today's parking sessions"""
+        try:
+            self._load_open_sessions()
+            # One vectorized parse per column; blank or truncated rows are skipped
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                balances = np.genfromtxt(
+                    self.cards_csv, delimiter=",", skip_header=1, usecols=(BALANCE,),
+                    dtype=np.float64, invalid_raise=False,
+                ).reshape(-1)
+                sessions = np.genfromtxt(
+                    self.plates_csv, delimiter=",", skip_header=1, usecols=(1, 2),
+                    dtype="U19", invalid_raise=False,
+                ).reshape(-1, 2)
+            balances = balances[~np.isnan(balances)]
+            status, in_time = sessions[:, 0], sessions[:, 1]
+            today = np.char.startswith(in_time, datetime.now().strftime("%Y-%m-%d "))
+            entries = int(today.sum())
+            paid = int((today & (status == "1")).sum())
+        except Exception as e:
+            print(f"[REPORT ERROR] {str(e)}")
+            return
+
+        unpaid = sum(1 for entry in self._open_sessions.values() if entry[2] == "0")
+        print(
+            "\n=== Daily Report ===\n"
+            f"Registered cards: {balances.size}\n"
+            f"Total balance: {balances.sum():.2f}\n"
+            f"Average balance: {balances.mean() if balances.size else 0.0:.2f}\n"
+            f"Entries today: {entries} ({paid} paid)\n"
+            f"Vehicles parked without payment: {unpaid}"
+        )
+
+    def close(self):
+        """Release the CSV handles and the RFID reader"""
+        for fp in (self._cards_fp, self._plates_fp):
+            if fp is not None:
+                fp.close()
+        self._cards_fp = self._plates_fp = None
+        self.rfid.close()
+
     def show_menu(self):
         """Display main menu"""
-        print("\n=== Parking Management System ===")
-        print("1. Register New Card")
-        print("2. Top Up Balance")
-        print("3. Check Card Details")
-        print("4. Process Exit")
-        print("5. Exit System")
+        print(
+            "\n=== Parking Management System ===\n"
+            "1. Register New Card\n"
+            "2. Top Up Balance\n"
+            "3. Check Card Details\n"
+            "4. Process Exit\n"
+            "5. Daily Report\n"
+            "6. Exit System"
+        )
 
     def run(self):
         """Main system loop"""
@@ -298,16 +473,25 @@ class PaymentProcessor:
                 elif choice == "4":
                     self.process_exit()
                 elif choice == "5":
+                    self.daily_report()
+                elif choice == "6":
                     print("Goodbye!")
                     break
                 else:
                     print("Invalid option")
-                time.sleep(1)
             except KeyboardInterrupt:
                 print("\nSystem shutting down...")
                 break
 
 
 if __name__ == "__main__":
-    processor = PaymentProcessor()
-    processor.run()
+    parser = argparse.ArgumentParser(description="Card registration, top-up and exit payment")
+    parser.add_argument("--debug", action="store_true", help="echo raw RFID serial traffic")
+    args = parser.parse_args()
+
+    PaymentProcessor.bootstrap()
+    processor = PaymentProcessor(debug=args.debug)
+    try:
+        processor.run()
+    finally:
+        processor.close()
@@ -1,5 +1,5 @@
-import csv
 import os
+from utils.plates_log import locked_plates_log
 
 csv_file = './database/plates_log.csv'
 
@@ -8,26 +8,22 @@ def mark_payment_success(plate_number):
         print("[ERROR] Log file does not exist.")
         return
 
+    # Payment Status is a single byte, so each unpaid row is patched where it is
+    # instead of rewriting the whole log
+    prefix = plate_number.encode() + b','
     updated = False
-    rows = []
 
-    # Read existing data
-    with open(csv_file, 'r') as f:
-        reader = csv.reader(f)
-        header = next(reader)
-        for row in reader:
+    # The writer lock keeps car_exit.py from swapping the file out mid-patch
+    with locked_plates_log(), open(csv_file, 'r+b') as f:
+        offset = len(f.readline())  # header
+        for line in f:
             # Match the plate with unpaid status
-            if row[0] == plate_number and row[1] == '0':
-                row[1] = '1'  # Mark as paid
+            if line.startswith(prefix + b'0,'):
+                os.pwrite(f.fileno(), b'1', offset + len(prefix))  # Mark as paid
                 updated = True
-            rows.append(row)
+            offset += len(line)
 
     if updated:
-        # Write back updated data
-        with open(csv_file, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(header)
-            writer.writerows(rows)
         print(f"[UPDATED] Payment status set to 1 for {plate_number}")
     else:
         print(f"[INFO] No unpaid record found for {plate_number}")
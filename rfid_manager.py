@@ -6,29 +6,54 @@ import time
 import os
 import random
 
+LOG_FIELDS = [
+    "Card ID",
+    "Plate Number",
+    "Balance",
+    "Last Top-up",
+    "Last Entry",
+    "Last Exit",
+]
+
+
+def reverse_readlines(path, chunk_size=4096):
+    """Yield a file's non-empty lines last to first, reading backwards in chunks"""
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        head = b""  # start of a line that continues into the previous chunk
+        while end > 0:
+            start = max(0, end - chunk_size)
+            f.seek(start)
+            lines = (f.read(end - start) + head).split(b"\n")
+            head = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode().rstrip("\r")
+            end = start
+        if head.strip():
+            yield head.decode().rstrip("\r")
+
 
 class RFIDManager:
-    def __init__(self):
+    def __init__(self, debug=False):
+        self.debug = debug  # echo raw serial traffic
         self.arduino = self.connect_arduino()
-        self.parking_rate = 200  # 200 per hour
         self.parking_log = "./database/parking_transactions.csv"
+        # Latest log row per card ID; this process is the log's only writer, so
+        # entries stay valid and a card is only searched for on disk once
+        self._latest = {}
         self.initialize_log()
+        # One line-buffered handle for the whole session: each row is on disk as
+        # soon as it is written, without an open/close per transaction
+        self._log_fh = open(self.parking_log, "a", newline="", buffering=1)
+        self._log_writer = csv.writer(self._log_fh)
 
     def initialize_log(self):
         """Initialize the CSV log file if it doesn't exist"""
         if not os.path.exists(self.parking_log):
             with open(self.parking_log, "w", newline="") as f:
                 writer = csv.writer(f)
-                writer.writerow(
-                    [
-                        "Card ID",
-                        "Plate Number",
-                        "Balance",
-                        "Last Top-up",
-                        "Last Entry",
-                        "Last Exit",
-                    ]
-                )
+                writer.writerow(LOG_FIELDS)
 
     def connect_arduino(self):
         """Connect to Arduino via serial port"""
@@ -67,26 +92,46 @@ class RFIDManager:
         if not self.arduino:
             return "SIM_" + str(random.randint(1000, 9999))
 
+        read_timeout = 10  # Wait up to 10 seconds; also the port's timeout for write_rfid's readline
         try:
             self.arduino.reset_input_buffer()  # Reset buffer once
             self.arduino.write(b"READ\n")
-            start_time = time.time()
-            response = ""
-            while time.time() - start_time < 10:  # Wait up to 10 seconds
-                if self.arduino.in_waiting > 0:
-                    print(f"[DEBUG] Raw Response: '{response}'")
-                    response += self.arduino.readline().decode().strip()
+            deadline = time.time() + read_timeout
+            try:
+                # Each timeout assignment reconfigures the port, so only touch it when
+                # it differs from the budget (normally it is already read_timeout)
+                if self.arduino.timeout != read_timeout:
+                    self.arduino.timeout = read_timeout
+                while True:
+                    # read_until blocks in the kernel (select) until "<END>" or the
+                    # timeout, instead of polling in_waiting every 100 ms
+                    frame = self.arduino.read_until(b"<END>").decode(errors="ignore")
+                    response = "".join(line.strip() for line in frame.splitlines())
+                    if self.debug:
+                        print(f"[DEBUG] Raw Response: '{response}'")
                     if response.endswith("<END>"):
                         response = response.replace("<END>", "")
                         if response and response != "NO_CARD" and len(response) >= 8:
-                            print(f"[DEBUG] Valid Card ID: '{response}'")
+                            if self.debug:
+                                print(f"[DEBUG] Valid Card ID: '{response}'")
                             return response
                         elif response == "NO_CARD":
                             return response
-                    elif response and response != "NO_CARD" and len(response) >= 8:
-                        print(f"[DEBUG] Partial Valid Card ID: '{response}'")
-                        return response  # Accept partial valid ID
-                time.sleep(0.1)  # Small delay to avoid CPU overload
+                    else:
+                        # Timed out mid-frame
+                        if response and response != "NO_CARD" and len(response) >= 8:
+                            if self.debug:
+                                print(f"[DEBUG] Partial Valid Card ID: '{response}'")
+                            return response  # Accept partial valid ID
+                        break
+                    # Garbled frame: wait for another one within what is left of the budget
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.arduino.timeout = remaining
+            finally:
+                if self.arduino.timeout != read_timeout:
+                    self.arduino.timeout = read_timeout  # write_rfid's readline relies on it
             print(f"[READ ERROR] No valid card ID after 10 seconds")
             return None
         except Exception as e:
@@ -102,18 +147,21 @@ class RFIDManager:
         try:
             self.arduino.reset_input_buffer()  # Reset buffer once
             data_str = f"WRITE,{card_id},{plate_number},{balance}\n"
-            print(f"[DEBUG] Sending write command: '{data_str.strip()}'")
+            if self.debug:
+                print(f"[DEBUG] Sending write command: '{data_str.strip()}'")
             self.arduino.write(data_str.encode())
             start_time = time.time()
             response = ""
             while time.time() - start_time < 12:  # Wait up to 12 seconds
                 if self.arduino.in_waiting > 0:
                     response += self.arduino.readline().decode().strip()
-                    print(f"[DEBUG] Raw Write Response: '{response}'")
+                    if self.debug:
+                        print(f"[DEBUG] Raw Write Response: '{response}'")
                     if response.endswith("<END>"):
                         response = response.replace("<END>", "")
                         if response == "WRITE_SUCCESS":
-                            print(f"[DEBUG] Write successful")
+                            if self.debug:
+                                print(f"[DEBUG] Write successful")
                             return True
                         elif response in [
                             "NO_CARD",
@@ -133,12 +181,15 @@ class RFIDManager:
 
     def get_card_data(self, card_id):
         """Retrieve card data from log file"""
+        if card_id in self._latest:
+            return self._latest[card_id]
         try:
-            with open(self.parking_log, "r") as f:
-                reader = csv.DictReader(f)
-                for row in reversed(list(reader)):
-                    if row["Card ID"] == card_id:
-                        return row
+            # Newest entries are at the end; stop at the first match from there
+            for line in reverse_readlines(self.parking_log):
+                row = next(csv.reader([line]))
+                if row[0] == card_id:
+                    self._latest[card_id] = dict(zip(LOG_FIELDS, row))
+                    return self._latest[card_id]
         except Exception as e:
             print(f"[LOG READ ERROR] {str(e)}")
         return None
@@ -147,20 +198,23 @@ class RFIDManager:
         """Log transaction to CSV file"""
         try:
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            with open(self.parking_log, "a", newline="") as f:
-                writer = csv.writer(f)
-                if action == "entry":
-                    writer.writerow([card_id, plate_number, balance, "", timestamp, ""])
-                elif action == "exit":
-                    writer.writerow([card_id, plate_number, balance, "", "", timestamp])
-                elif action == "topup":
-                    writer.writerow([card_id, plate_number, balance, timestamp, "", ""])
+            if action == "entry":
+                row = [card_id, plate_number, balance, "", timestamp, ""]
+            elif action == "exit":
+                row = [card_id, plate_number, balance, "", "", timestamp]
+            elif action == "topup":
+                row = [card_id, plate_number, balance, timestamp, "", ""]
+            else:
+                return True
+            self._log_writer.writerow(row)
+            self._latest[card_id] = dict(zip(LOG_FIELDS, map(str, row)))
             return True
         except Exception as e:
             print(f"[LOG WRITE ERROR] {str(e)}")
             return False
 
-    def calculate_fee(self, entry_time, exit_time):
-        """Calculate parking fee based on duration"""
-        duration_hours = (exit_time - entry_time).total_seconds() / 3600
-        return round(duration_hours * self.parking_rate, 2)
+    def close(self):
+        """Close the transaction log and the serial port"""
+        self._log_fh.close()
+        if self.arduino:
+            self.arduino.close()
@@ -1,41 +1,169 @@
 # scripts/auto_label.py
+from concurrent.futures import ThreadPoolExecutor
 import cv2
+import numpy as np
+import torch
+import torch.nn.functional as F
 from ultralytics import YOLO
 import os
 
+# nvJPEG decoding through torchvision; without it every image goes through OpenCV
+try:
+    from torchvision.io import ImageReadMode, decode_jpeg, read_file
+except ImportError:
+    decode_jpeg = None
 
-def auto_label(images_dir="dataset/raw", output_dir="dataset/raw/labels"):
+
+def read_image(path, raw_jpeg):
+    """Raw JPEG bytes for decoding on the GPU, otherwise a BGR array from OpenCV"""
+    try:
+        if raw_jpeg and path.lower().endswith((".jpg", ".jpeg")):
+            return read_file(path)
+        return cv2.imread(path)
+    except RuntimeError:
+        return None
+
+
+def decode_jpegs_on_gpu(datas, imgsz):
+    """
+    nvJPEG-decode raw JPEGs into one RGB, 0-1, imgsz x imgsz letterboxed batch on the GPU
+
+    Mirrors Ultralytics' own letterbox (long side scaled to imgsz, grey padding)
+    so the GPU and OpenCV paths see the same, undistorted plates.
+
+    Returns:
+        tuple: (batch tensor, [(scale, pad_x, pad_y, width, height) per image])
+    """
+    imgs = decode_jpeg(datas, mode=ImageReadMode.RGB, device="cuda")
+    batch = torch.full((len(imgs), 3, imgsz, imgsz), 114 / 255, device="cuda")
+    letterboxes = []
+    for i, img in enumerate(imgs):
+        h, w = img.shape[1:]
+        scale = min(imgsz / h, imgsz / w)
+        new_h, new_w = round(h * scale), round(w * scale)
+        pad_y, pad_x = (imgsz - new_h) // 2, (imgsz - new_w) // 2
+        batch[i, :, pad_y:pad_y + new_h, pad_x:pad_x + new_w] = F.interpolate(
+            img[None].float(), size=(new_h, new_w), mode="bilinear", align_corners=False
+        )[0] / 255
+        letterboxes.append((scale, pad_x, pad_y, w, h))
+    return batch, letterboxes
+
+
+def write_labels(output_dir, img_file, result, letterbox=None):
+    """Write one image's detections as a YOLO label file"""
+    if letterbox is None:
+        xywhn = result.boxes.xywhn.cpu().numpy()
+    else:
+        # Boxes are in letterboxed input coordinates; map them back to the original image
+        scale, pad_x, pad_y, w, h = letterbox
+        xyxy = (result.boxes.xyxy.cpu().numpy() - [pad_x, pad_y, pad_x, pad_y]) / scale
+        xyxy = xyxy.clip(0, [w, h, w, h])
+        xywhn = np.column_stack([
+            (xyxy[:, 0] + xyxy[:, 2]) / (2 * w),
+            (xyxy[:, 1] + xyxy[:, 3]) / (2 * h),
+            (xyxy[:, 2] - xyxy[:, 0]) / w,
+            (xyxy[:, 3] - xyxy[:, 1]) / h,
+        ])
+
+    # YOLO format (class 0, normalized center-x, center-y, width, height)
+    labels = np.hstack([np.zeros((len(xywhn), 1)), xywhn])
+
+    # Create label file; the buffered handle turns the rows into a single write
+    label_file = os.path.splitext(img_file)[0] + ".txt"
+    with open(os.path.join(output_dir, label_file), "w") as f:
+        np.savetxt(f, labels, fmt="%d %.6f %.6f %.6f %.6f")
+
+    print(f"Processed {img_file}")
+
+
+def auto_label(images_dir="dataset/raw", output_dir="dataset/raw/labels", batch_size=16, imgsz=640):
     # Load pretrained plate detection model
-    model = YOLO("yolov8n.pt")  # or your custom model
+    model_path = "yolov8n.pt"  # or your custom model
+    engine_path = os.path.splitext(model_path)[0] + ".engine"
+    # FP16 only pays off (and is only supported) on the GPU
+    half = torch.cuda.is_available()
+    if half and not os.path.exists(engine_path):
+        try:
+            print(f"Exporting {model_path} to a TensorRT FP16 engine...")
+            # dynamic so the last, shorter batch still fits the engine
+            engine_path = YOLO(model_path).export(
+                format="engine", half=True, dynamic=True, batch=batch_size
+            )
+        except Exception as e:
+            print(f"TensorRT export failed, using PyTorch weights: {str(e)}")
+    if half and os.path.exists(engine_path):
+        model = YOLO(engine_path, task="detect")
+    else:
+        model = YOLO(model_path)
+    # JPEGs are read as raw bytes and decoded on the GPU, keeping pixels on the device
+    gpu_decode = half and decode_jpeg is not None
 
     os.makedirs(output_dir, exist_ok=True)
 
-    for img_file in os.listdir(images_dir):
-        if not img_file.lower().endswith((".jpg", ".jpeg", ".png")):
-            continue
+    img_files = [
+        img_file
+        for img_file in sorted(os.listdir(images_dir))
+        if img_file.lower().endswith((".jpg", ".jpeg", ".png"))
+    ]
+    batches = [
+        img_files[start:start + batch_size]
+        for start in range(0, len(img_files), batch_size)
+    ]
+
+    # Decode the next batch on reader threads while the model runs on the
+    # current one, and write label files on writer threads
+    with ThreadPoolExecutor(max_workers=4) as readers, \
+            ThreadPoolExecutor(max_workers=4) as writers:
+
+        def prefetch(batch_files):
+            return [
+                readers.submit(read_image, os.path.join(images_dir, img_file), gpu_decode)
+                for img_file in batch_files
+            ]
 
-        # Process image
-        img_path = os.path.join(images_dir, img_file)
-        img = cv2.imread(img_path)
-        results = model(img)
+        pending = prefetch(batches[0]) if batches else []
+        written = []
+        for i, batch_files in enumerate(batches):
+            imgs = [future.result() for future in pending]
+            if i + 1 < len(batches):
+                pending = prefetch(batches[i + 1])
 
-        # Create label file
-        label_file = os.path.splitext(img_file)[0] + ".txt"
-        with open(os.path.join(output_dir, label_file), "w") as f:
-            for box in results[0].boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
+            jpegs, arrays = [], []
+            for img_file, img in zip(batch_files, imgs):
+                if img is None:
+                    print(f"Could not read {img_file}, skipping")
+                elif isinstance(img, torch.Tensor):
+                    jpegs.append((img_file, img))
+                else:
+                    arrays.append((img_file, img))
 
-                # Convert to YOLO format (normalized center-x, center-y, width, height)
-                img_h, img_w = img.shape[:2]
-                x_center = ((x1 + x2) / 2) / img_w
-                y_center = ((y1 + y2) / 2) / img_h
-                width = (x2 - x1) / img_w
-                height = (y2 - y1) / img_h
+            groups = []
+            if jpegs:
+                try:
+                    batch, letterboxes = decode_jpegs_on_gpu([data for _, data in jpegs], imgsz)
+                    groups.append((jpegs, batch, letterboxes))
+                except RuntimeError as e:
+                    print(f"GPU JPEG decode failed, using OpenCV: {str(e)}")
+                    for img_file, _ in jpegs:
+                        img = cv2.imread(os.path.join(images_dir, img_file))
+                        if img is None:
+                            print(f"Could not read {img_file}, skipping")
+                        else:
+                            arrays.append((img_file, img))
+            if arrays:
+                # Ultralytics letterboxes these itself and returns original-image boxes
+                groups.append((arrays, [img for _, img in arrays], [None] * len(arrays)))
 
-                # Write to file (class 0, coordinates)
-                f.write(f"0 {x_center} {y_center} {width} {height}\n")
+            for items, source, letterboxes in groups:
+                results = model(source, imgsz=imgsz, half=half, verbose=False)
+                for (img_file, _), result, letterbox in zip(items, results, letterboxes):
+                    written.append(
+                        writers.submit(write_labels, output_dir, img_file, result, letterbox)
+                    )
 
-        print(f"Processed {img_file}")
+        # Surface any write errors
+        for future in written:
+            future.result()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,17 @@
 import os
 import shutil
-import random
-from sklearn.model_selection import train_test_split
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+def link_or_copy(src, dst):
+    """Hardlink src to dst, or copy it (copy_file_range on Linux) across filesystems"""
+    try:
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
 
 
 def split_dataset(dataset_path="dataset-new/raw", output_path="../dataset/processed"):
@@ -11,33 +21,39 @@ def split_dataset(dataset_path="dataset-new/raw", output_path="../dataset/proces
         os.makedirs(f"{output_path}/{split}/images", exist_ok=True)
         os.makedirs(f"{output_path}/{split}/labels", exist_ok=True)
 
-    # Get all images
-    images = [f for f in os.listdir(f"{dataset_path}") if f.endswith(".jpg")]
-    random.shuffle(images)
+    # Get all images (from the directory they are copied out of) and list the
+    # labels once instead of stat-ing for each one
+    images = sorted(f for f in os.listdir(f"{dataset_path}/images") if f.endswith(".jpg"))
+    label_set = set(os.listdir(f"{dataset_path}/labels"))
 
-    # Split 70% train, 20% val, 10% test
-    train, test = train_test_split(images, test_size=0.3, random_state=42)
-    val, test = train_test_split(test, test_size=0.33, random_state=42)
+    # Split 70% train, 20% val, 10% test with a single shuffle
+    n = len(images)
+    order = np.random.default_rng(42).permutation(n)
+    train_idx, val_idx, test_idx = np.split(order, [int(0.7 * n), int(0.9 * n)])
+    train = [images[i] for i in train_idx]
+    val = [images[i] for i in val_idx]
+    test = [images[i] for i in test_idx]
 
     # Helper function to copy files
-    def copy_files(files, split):
-        for file in files:
-            # Copy image
-            shutil.copy(
-                f"{dataset_path}/images/{file}", f"{output_path}/{split}/images/{file}"
+    def copy_pair(file, split):
+        # Images are never modified after the split, so hardlink them
+        link_or_copy(
+            f"{dataset_path}/images/{file}", f"{output_path}/{split}/images/{file}"
+        )
+        # Copy corresponding label
+        label_file = os.path.splitext(file)[0] + ".txt"
+        if label_file in label_set:
+            shutil.copyfile(
+                f"{dataset_path}/labels/{label_file}",
+                f"{output_path}/{split}/labels/{label_file}",
             )
-            # Copy corresponding label
-            label_file = os.path.splitext(file)[0] + ".txt"
-            if os.path.exists(f"{dataset_path}/labels/{label_file}"):
-                shutil.copy(
-                    f"{dataset_path}/labels/{label_file}",
-                    f"{output_path}/{split}/labels/{label_file}",
-                )
-
-    copy_files(train, "train")
-    copy_files(val, "val")
-    copy_files(test, "test")
 
+    # Copies are syscall-bound and release the GIL, so threads overlap them
+    jobs = [(file, "train") for file in train]
+    jobs += [(file, "val") for file in val]
+    jobs += [(file, "test") for file in test]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda job: copy_pair(*job), jobs))
 
 if __name__ == "__main__":
     split_dataset()
@@ -9,12 +9,14 @@ def train_model():
     results = model.train(
         data='license_plate.yaml',      # path to data config file
         epochs=100,                     # number of training epochs
-        imgsz=640,                      # image size
+        imgsz=640,                      # image size (entry gate infers at 640, exit gate at 384)
         batch=16,                       # batch size
         patience=20,                    # early stopping patience
         save=True,                      # save checkpoints
         device='0',                     # cuda device (use 'cpu' if no GPU)
-        workers=8,                      # number of worker threads
+        workers=min(16, os.cpu_count() or 1),  # number of worker threads
+        amp=True,                       # FP16 mixed precision training
+        cache='ram',                    # keep decoded images in RAM across epochs
         project='runs/train',           # save to project/name
         name='license_plate_model',     # experiment name
         exist_ok=True,                  # existing project/name ok, do not increment
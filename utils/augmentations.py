@@ -1,10 +1,24 @@
+import functools
+
 import albumentations as A
 import cv2
 import numpy as np
 
+# CLAHE, GaussNoise, MotionBlur and HueSaturationValue run as per-pixel OpenCV
+# kernels. The pip opencv-python wheels leave out TBB; on training machines, an
+# OpenCV built from source with
+#   -D WITH_IPP=ON -D WITH_TBB=ON -D CPU_BASELINE=AVX2 -D CPU_DISPATCH=AVX512_SKX
+# makes these transforms noticeably faster. Either way, make sure the optimised
+# code paths are switched on.
+cv2.setUseOptimized(True)
+if hasattr(cv2, "ipp"):
+    cv2.ipp.setUseIPP(True)
+
 
 class PlateAugmentations:
+    # Pipelines are built once per process and image size, then reused
     @staticmethod
+    @functools.lru_cache(maxsize=2)
     def get_train_augmentations(img_size=640):
         return A.Compose(
             [
@@ -20,8 +34,8 @@ class PlateAugmentations:
                 A.RandomShadow(p=0.1),
                 A.RandomSunFlare(p=0.1),
                 # Geometric
-                A.ShiftScaleRotate(
-                    shift_limit=0.1, scale_limit=0.1, rotate_limit=10, p=0.5
+                A.Affine(
+                    translate_percent=(-0.1, 0.1), scale=(0.9, 1.1), rotate=(-10, 10), p=0.5
                 ),
                 # Perspective
                 A.Perspective(scale=(0.05, 0.1), p=0.3),
@@ -34,11 +48,11 @@ class PlateAugmentations:
         )
 
     @staticmethod
+    @functools.lru_cache(maxsize=2)
     def get_val_augmentations(img_size=640):
+        # No resize: YOLO's loader letterboxes to imgsz itself
         return A.Compose(
-            [
-                A.Resize(img_size, img_size),
-            ],
+            [],
             bbox_params=A.BboxParams(
                 format="yolo", min_visibility=0.4, label_fields=["class_labels"]
             ),
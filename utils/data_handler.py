@@ -1,21 +1,32 @@
-import pandas as pd
 from datetime import datetime
 from sqlalchemy import create_engine, text
+import atexit
+import functools
 import json
-import os
+import queue
+import threading
+from itertools import groupby
 from urllib.parse import quote_plus
 
+@functools.lru_cache(maxsize=1)
+def _read_db_config():
+    # Failures raise, so only a successfully parsed config is cached
+    with open('config/database.json', 'r') as f:
+        return json.load(f)
+
 def load_db_config():
-    """Load database configuration from config file"""
+    """Load database configuration from config file (read once per process)"""
     try:
-        with open('config/database.json', 'r') as f:
-            return json.load(f)
+        return _read_db_config()
     except Exception as e:
         print(f"Error loading database configuration: {str(e)}")
         return None
 
-def get_db_connection():
-    """Create database connection"""
+def get_db_connection(**engine_options):
+    """Create database connection
+
+    Extra keyword arguments (pool_size, pool_pre_ping, ...) go to create_engine.
+    """
     config = load_db_config()
     if config is None:
         return None
@@ -23,78 +34,137 @@ def get_db_connection():
     try:
         password = quote_plus(config['password'])
         connection_string = f"postgresql://{config['user']}:{password}@{config['host']}:{config['port']}/{config['database']}"
-        engine = create_engine(connection_string)
+        engine = create_engine(connection_string, **engine_options)
         return engine
     except Exception as e:
         print(f"Error connecting to database: {str(e)}")
         return None
 
+# Pooled engine shared by save_vehicle_entry() and update_vehicle_exit()
+_ENGINE = None
+
+def get_shared_engine():
+    """Return the module's pooled engine, creating it on first use"""
+    global _ENGINE
+    if _ENGINE is None:
+        _ENGINE = get_db_connection(pool_size=5, pool_pre_ping=True, pool_recycle=1800)
+    return _ENGINE
+
+# Writes are queued and sent by one background thread: whatever has piled up
+# (up to WRITE_BATCH_SIZE records) goes out in a single transaction, with
+# consecutive records of the same kind sent as one executemany. Records keep
+# their order, so an exit update never overtakes its entry insert.
+WRITE_QUERIES = {
+    "entry": text("""
+        INSERT INTO vehicle_logs (plate_number, in_time, out_time)
+        VALUES (:plate_number, :in_time, :out_time)
+    """),
+    "unauthorized": text("""
+        INSERT INTO unauthorized_exits (plate_number, timestamp)
+        VALUES (:plate_number, :timestamp)
+    """),
+    "exit": text("""
+        UPDATE vehicle_logs 
+        SET out_time = :out_time
+        WHERE plate_number = :plate_number 
+        AND out_time IS NULL
+    """),
+}
+WRITE_BATCH_SIZE = 128
+_write_queue = queue.Queue()
+_writer_thread = None
+_writer_lock = threading.Lock()
+
+def _queue_write(kind, params):
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None:
+            _writer_thread = threading.Thread(target=_run_writer, daemon=True)
+            _writer_thread.start()
+            atexit.register(flush_pending_writes)
+    _write_queue.put((kind, params))
+
+def _run_writer():
+    while True:
+        record = _write_queue.get()
+        if record is None:
+            return
+        batch = [record]
+        while len(batch) < WRITE_BATCH_SIZE:
+            try:
+                record = _write_queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is None:
+                _write_batch(batch)
+                return
+            batch.append(record)
+        _write_batch(batch)
+
+def _write_batch(batch):
+    engine = get_shared_engine()
+    if engine is None:
+        for kind, params in batch:
+            print(f"Error writing {kind} record {params} to database: no database connection")
+        return
+    try:
+        with engine.begin() as conn:
+            for kind, records in groupby(batch, key=lambda record: record[0]):
+                conn.execute(WRITE_QUERIES[kind], [params for _, params in records])
+        return
+    except Exception as e:
+        print(f"Error writing {len(batch)} vehicle records to database, retrying one by one: {str(e)}")
+
+    # One bad record rolls back the whole batch; retry each on its own so only it is lost
+    for kind, params in batch:
+        try:
+            with engine.begin() as conn:
+                conn.execute(WRITE_QUERIES[kind], params)
+        except Exception as e:
+            print(f"Error writing {kind} record {params} to database: {str(e)}")
+
+def flush_pending_writes():
+    """Write out every queued record and stop the writer thread (runs at exit)"""
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None:
+            return
+        _write_queue.put(None)
+        _writer_thread.join()
+        _writer_thread = None
+
 def save_vehicle_entry(plate_number, in_time=None, out_time=None, is_unauthorized=False):
     """
-    Save vehicle entry to both CSV and database
+    Save vehicle entry to the database
     
     Args:
         plate_number (str): Vehicle plate number
         in_time (datetime, optional): Entry time. Defaults to current time if None
         out_time (datetime, optional): Exit time. Defaults to None
         is_unauthorized (bool, optional): Whether this is an unauthorized exit. Defaults to False
+
+    Returns:
+        bool: True once the record is queued, False if it could not be queued. The
+        write itself happens later on the writer thread, which logs any record it
+        fails to store
     """
     try:
         # Set default in_time to current time if not provided
         if in_time is None:
             in_time = datetime.now()
         
-        # Save to CSV
-        # if is_unauthorized:
-        #     csv_path = "database/unauthorized_exits.csv"
-        #     data = {
-        #         'Plate Number': [plate_number],
-        #         'Timestamp': [in_time]
-        #     }
-        # else:
-        #     csv_path = "database/plates_log.csv"
-        #     data = {
-        #         'Plate Number': [plate_number],
-        #         'In time': [in_time],
-        #         'Out time': [out_time]
-        #     }
-        
-        # # Create directory if it doesn't exist
-        # os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-        
-        # # Append to CSV
-        # df = pd.DataFrame(data)
-        # if os.path.exists(csv_path):
-        #     df.to_csv(csv_path, mode='a', header=False, index=False)
-        # else:
-        #     df.to_csv(csv_path, index=False)
-        
-        # Save to database
-        engine = get_db_connection()
-        if engine is not None:
-            if is_unauthorized:
-                query = text("""
-                    INSERT INTO unauthorized_exits (plate_number, timestamp)
-                    VALUES (:plate_number, :timestamp)
-                """)
-                with engine.connect() as conn:
-                    conn.execute(query, {
-                        "plate_number": plate_number,
-                        "timestamp": in_time
-                    })
-                    conn.commit()
-            else:
-                query = text("""
-                    INSERT INTO vehicle_logs (plate_number, in_time, out_time)
-                    VALUES (:plate_number, :in_time, :out_time)
-                """)
-                with engine.connect() as conn:
-                    conn.execute(query, {
-                        "plate_number": plate_number,
-                        "in_time": in_time,
-                        "out_time": out_time
-                    })
-                    conn.commit()
+        # Save to database (queued; written in batches by the writer thread)
+        if is_unauthorized:
+            _queue_write("unauthorized", {
+                "plate_number": plate_number,
+                "timestamp": in_time
+            })
+        else:
+            _queue_write("entry", {
+                "plate_number": plate_number,
+                "in_time": in_time,
+                "out_time": out_time
+            })
         
         return True
     except Exception as e:
@@ -103,40 +173,26 @@ def save_vehicle_entry(plate_number, in_time=None, out_time=None, is_unauthorize
 
 def update_vehicle_exit(plate_number, out_time=None):
     """
-    Update vehicle exit time in both CSV and database
+    Update vehicle exit time in the database
     
     Args:
         plate_number (str): Vehicle plate number
         out_time (datetime, optional): Exit time. Defaults to current time if None
+
+    Returns:
+        bool: True once the update is queued, False if it could not be queued. The
+        write itself happens later on the writer thread, which logs any record it
+        fails to store
     """
     try:
         if out_time is None:
             out_time = datetime.now()
         
-        # # Update CSV
-        # csv_path = "database/plates_log.csv"
-        # if os.path.exists(csv_path):
-        #     df = pd.read_csv(csv_path)
-        #     mask = (df['Plate Number'] == plate_number) & (pd.isna(df['Out time']) | (df['Out time'] == ''))
-        #     if mask.any():
-        #         df.loc[mask, 'Out time'] = out_time
-        #         df.to_csv(csv_path, index=False)
-        
-        # Update database
-        engine = get_db_connection()
-        if engine is not None:
-            query = text("""
-                UPDATE vehicle_logs 
-                SET out_time = :out_time
-                WHERE plate_number = :plate_number 
-                AND out_time IS NULL
-            """)
-            with engine.connect() as conn:
-                conn.execute(query, {
-                    "plate_number": plate_number,
-                    "out_time": out_time
-                })
-                conn.commit()
+        # Update database (queued behind any pending entries for the same plate)
+        _queue_write("exit", {
+            "plate_number": plate_number,
+            "out_time": out_time
+        })
         
         return True
     except Exception as e:
@@ -0,0 +1,198 @@
+import numpy as np
+from numba import njit, prange
+
+
+@njit(parallel=True, cache=True, fastmath=True)
+def preprocess(gray, clip_limit=2.0, tiles=8, block_size=11, c=2):
+    """
+    Fused CLAHE + adaptive mean threshold for a grayscale plate crop
+
+    Mirrors the OpenCV CLAHE -> adaptiveThreshold chain in a single JIT-compiled
+    kernel, parallelised across tiles and rows.
+
+    Args:
+        gray (np.ndarray): uint8 grayscale image (H, W)
+        clip_limit (float, optional): CLAHE contrast clip limit. Defaults to 2.0
+        tiles (int, optional): Tiles per side of the CLAHE grid. Defaults to 8
+        block_size (int, optional): Odd neighbourhood size for the local mean. Defaults to 11
+        c (int, optional): Constant subtracted from the local mean. Defaults to 2
+
+    Returns:
+        np.ndarray: uint8 binary image (0 / 255)
+    """
+    h, w = gray.shape
+    tile_h = max((h + tiles - 1) // tiles, 1)
+    tile_w = max((w + tiles - 1) // tiles, 1)
+    tiles_y = (h + tile_h - 1) // tile_h
+    tiles_x = (w + tile_w - 1) // tile_w
+
+    # Per-tile clipped histogram -> equalisation lookup table
+    luts = np.empty((tiles_y, tiles_x, 256), dtype=np.float32)
+    for t in prange(tiles_y * tiles_x):
+        ty = t // tiles_x
+        tx = t % tiles_x
+        y0 = ty * tile_h
+        y1 = min(y0 + tile_h, h)
+        x0 = tx * tile_w
+        x1 = min(x0 + tile_w, w)
+
+        hist = np.zeros(256, dtype=np.int64)
+        for y in range(y0, y1):
+            for x in range(x0, x1):
+                hist[gray[y, x]] += 1
+
+        area = (y1 - y0) * (x1 - x0)
+        limit = max(int(clip_limit * area / 256), 1)
+        excess = 0
+        for v in range(256):
+            if hist[v] > limit:
+                excess += hist[v] - limit
+                hist[v] = limit
+        bonus = excess // 256
+
+        cdf = 0
+        scale = 255.0 / area
+        for v in range(256):
+            cdf += hist[v] + bonus
+            luts[ty, tx, v] = min(cdf * scale, 255.0)
+
+    # Bilinear blend of the four neighbouring tile LUTs
+    out = np.empty((h, w), dtype=np.uint8)
+    for y in prange(h):
+        fy = (y + 0.5) / tile_h - 0.5
+        ty0 = int(np.floor(fy))
+        wy = fy - ty0
+        ty1 = min(max(ty0 + 1, 0), tiles_y - 1)
+        ty0 = min(max(ty0, 0), tiles_y - 1)
+        for x in range(w):
+            fx = (x + 0.5) / tile_w - 0.5
+            tx0 = int(np.floor(fx))
+            wx = fx - tx0
+            tx1 = min(max(tx0 + 1, 0), tiles_x - 1)
+            tx0 = min(max(tx0, 0), tiles_x - 1)
+
+            v = gray[y, x]
+            top = luts[ty0, tx0, v] * (1.0 - wx) + luts[ty0, tx1, v] * wx
+            bottom = luts[ty1, tx0, v] * (1.0 - wx) + luts[ty1, tx1, v] * wx
+            out[y, x] = np.uint8(top * (1.0 - wy) + bottom * wy + 0.5)
+
+    # Integral image of the equalised crop for O(1) local means
+    integral = np.zeros((h + 1, w + 1), dtype=np.int64)
+    for y in prange(h):
+        acc = 0
+        for x in range(w):
+            acc += out[y, x]
+            integral[y + 1, x + 1] = acc
+    for x in prange(1, w + 1):
+        for y in range(1, h + 1):
+            integral[y, x] += integral[y - 1, x]
+
+    # Threshold in place: each pixel only needs its own value plus the integral image
+    r = block_size // 2
+    for y in prange(h):
+        ya = max(y - r, 0)
+        yb = min(y + r + 1, h)
+        for x in range(w):
+            xa = max(x - r, 0)
+            xb = min(x + r + 1, w)
+            total = integral[yb, xb] - integral[ya, xb] - integral[yb, xa] + integral[ya, xa]
+            mean = total / ((yb - ya) * (xb - xa))
+            out[y, x] = 255 if out[y, x] > mean - c else 0
+
+    return out
+
+
+@njit(cache=True)
+def _reflect101(i, n):
+    # OpenCV's default border: mirror without repeating the edge pixel
+    if n == 1:
+        return 0
+    while i < 0 or i >= n:
+        if i < 0:
+            i = -i
+        if i >= n:
+            i = 2 * n - 2 - i
+    return i
+
+
+@njit(cache=True, fastmath=True)
+def gray_blur_otsu(bgr):
+    """
+    Fused grayscale + 5x5 Gaussian blur + Otsu threshold for a BGR plate crop
+
+    Matches cvtColor(BGR2GRAY) -> GaussianBlur((5, 5), 0) -> THRESH_OTSU, using
+    OpenCV's fixed-point luma weights and the [1 4 6 4 1] / 16 kernel.
+
+    Args:
+        bgr (np.ndarray): uint8 BGR image (H, W, 3); non-contiguous slices are fine
+
+    Returns:
+        np.ndarray: uint8 binary image (0 / 255)
+    """
+    h, w = bgr.shape[0], bgr.shape[1]
+    k0, k1, k2 = 1, 4, 6
+
+    gray = np.empty((h, w), dtype=np.uint16)
+    for y in range(h):
+        for x in range(w):
+            gray[y, x] = (
+                bgr[y, x, 0] * 1868 + bgr[y, x, 1] * 9617 + bgr[y, x, 2] * 4899 + 8192
+            ) >> 14
+
+    # Horizontal 1x5 pass
+    tmp = np.empty((h, w), dtype=np.uint16)
+    for y in range(h):
+        for x in range(w):
+            tmp[y, x] = (
+                k0 * gray[y, _reflect101(x - 2, w)]
+                + k1 * gray[y, _reflect101(x - 1, w)]
+                + k2 * gray[y, x]
+                + k1 * gray[y, _reflect101(x + 1, w)]
+                + k0 * gray[y, _reflect101(x + 2, w)]
+            )
+
+    # Vertical 5x1 pass, building the histogram as we go
+    blur = np.empty((h, w), dtype=np.uint8)
+    hist = np.zeros(256, dtype=np.int64)
+    for y in range(h):
+        ya = _reflect101(y - 2, h)
+        yb = _reflect101(y - 1, h)
+        yc = _reflect101(y + 1, h)
+        yd = _reflect101(y + 2, h)
+        for x in range(w):
+            acc = (
+                k0 * tmp[ya, x] + k1 * tmp[yb, x] + k2 * tmp[y, x]
+                + k1 * tmp[yc, x] + k0 * tmp[yd, x]
+            )
+            v = (acc + 128) >> 8
+            blur[y, x] = v
+            hist[v] += 1
+
+    # Otsu: maximise between-class variance
+    total = h * w
+    sum_all = 0.0
+    for v in range(256):
+        sum_all += v * hist[v]
+    sum_b = 0.0
+    w_b = 0
+    best = -1.0
+    thresh = 0
+    for v in range(256):
+        w_b += hist[v]
+        if w_b == 0:
+            continue
+        w_f = total - w_b
+        if w_f == 0:
+            break
+        sum_b += v * hist[v]
+        m_b = sum_b / w_b
+        m_f = (sum_all - sum_b) / w_f
+        between = w_b * w_f * (m_b - m_f) ** 2
+        if between > best:
+            best = between
+            thresh = v
+
+    for y in range(h):
+        for x in range(w):
+            blur[y, x] = 255 if blur[y, x] > thresh else 0
+    return blur
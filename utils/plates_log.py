@@ -0,0 +1,39 @@
+import fcntl
+import os
+from contextlib import contextmanager
+
+# plates_log.csv is shared by car_entry (appends), payment_processor and
+# payment_success (patch the status byte in place) and car_exit (swaps in a
+# rewritten copy). Every writer holds this lock while it touches the file.
+PLATES_LOG = "./database/plates_log.csv"
+PLATES_LOG_LOCK = PLATES_LOG + ".lock"
+# car_exit's exits (plate, in time, out time) not yet folded into the CSV
+PLATES_LOG_JOURNAL = "./database/plates_log.journal"
+
+
+@contextmanager
+def locked_plates_log():
+    """Hold the cross-process plates_log.csv writer lock for the duration of the block"""
+    # A sidecar file, so the lock survives car_exit replacing the log itself
+    with open(PLATES_LOG_LOCK, "a") as lock_fh:
+        fcntl.flock(lock_fh, fcntl.LOCK_EX)
+        yield
+
+
+def is_replaced(fh, path=PLATES_LOG):
+    """
+    Check whether `path` still names the file `fh` has open
+
+    Args:
+        fh: Open file object
+        path (str, optional): Path the handle was opened from. Defaults to PLATES_LOG
+
+    Returns:
+        bool: True if the file was replaced or removed since `fh` was opened
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return True
+    opened = os.fstat(fh.fileno())
+    return (stat.st_dev, stat.st_ino) != (opened.st_dev, opened.st_ino)